@@ -0,0 +1,86 @@
+import numpy as np
+from typing import Dict, List
+from alert_rules import RulePlan, SEVERITIES
+
+RAISED = "raised"
+CLEARED = "cleared"
+
+
+class CameraAlertState:
+    def __init__(self, rules: int, types: int):
+        self.raised = np.zeros(rules, dtype=bool)
+        self.true_since = np.full(rules, np.nan)
+        self.false_since = np.full(rules, np.nan)
+        self.type_active = np.zeros(types, dtype=bool)
+        self.type_announced = np.zeros(types, dtype=bool)
+        self.type_since = np.full(types, np.nan)
+        self.last_raised = np.full(types, -np.inf)
+
+
+class AlertAggregator:
+    def __init__(self):
+        self.plan = None
+        self.cameras: Dict[str, CameraAlertState] = {}
+
+    def state(self, camera: str, plan: RulePlan) -> CameraAlertState:
+        if plan is not self.plan:
+            # Rule indexes change when the plan is recompiled, so per-rule timers start over.
+            self.plan = plan
+            self.cameras = {}
+        state = self.cameras.get(camera)
+        if state is None:
+            state = self.cameras[camera] = CameraAlertState(len(plan), len(plan.type_names))
+        return state
+
+    def update(self, camera: str, plan: RulePlan, fired: np.ndarray, now: float) -> List[Dict]:
+        state = self.state(camera, plan)
+
+        # A dropout shorter than clear_after does not restart the min_duration timer, and does not clear a raised rule.
+        state.false_since[fired] = np.nan
+        state.false_since[~fired & np.isnan(state.false_since)] = now
+        settled_false = ~fired & (now - state.false_since >= plan.clear_after)
+        state.true_since[settled_false] = np.nan
+        state.true_since[fired & np.isnan(state.true_since)] = now
+
+        state.raised |= ~state.raised & fired & (now - state.true_since >= plan.min_duration)
+        state.raised &= ~(state.raised & settled_false)
+
+        type_active = np.bincount(plan.rule_type, weights=state.raised, minlength=len(plan.type_names)) > 0
+        changed = np.flatnonzero(type_active != state.type_active)
+        state.type_active = type_active
+        if not len(changed):
+            return []
+
+        transitions = []
+        for index in changed.tolist():
+            if type_active[index]:
+                state.type_since[index] = now
+                # Within the cooldown the alert is tracked but not announced again.
+                if now - state.last_raised[index] < plan.type_cooldown[index]:
+                    continue
+                state.last_raised[index] = now
+                state.type_announced[index] = True
+                transition = RAISED
+            else:
+                if not state.type_announced[index]:
+                    continue
+                state.type_announced[index] = False
+                transition = CLEARED
+
+            rules = np.flatnonzero(plan.rule_type == index)
+            if transition == RAISED:
+                rules = rules[state.raised[rules]]
+            transitions.append({
+                'transition': transition,
+                'alert_type': plan.type_names[index],
+                'severity': SEVERITIES[plan.type_rank[index]],
+                'rules': [plan.names[rule] for rule in rules.tolist()],
+                'duration': round(float(now - state.type_since[index]), 2) if transition == CLEARED else 0.0
+            })
+        return transitions
+
+    def active_types(self, camera: str) -> List[str]:
+        state = self.cameras.get(camera)
+        if state is None or self.plan is None:
+            return []
+        return [self.plan.type_names[index] for index in np.flatnonzero(state.type_active).tolist()]
@@ -0,0 +1,261 @@
+import numpy as np
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+from config import ConfigError
+
+SEVERITIES = ('none', 'low', 'medium', 'high', 'critical')
+RULE_KEYS = {'name', 'alert_type', 'severity', 'classes', 'hours', 'threshold', 'min_dwell', 'zones', 'anomaly', 'cameras', 'message',
+             'min_duration', 'clear_after', 'clear_margin', 'cooldown'}
+DEFAULT_MESSAGE = "{name}: {count} detected (threshold: {threshold})"
+# Above this many histogram cells, levels are counted one at a time instead of in a single bincount.
+MAX_HISTOGRAM = 1 << 22
+
+
+def hour_window(spec, night_start: float, night_end: float) -> Tuple[float, float]:
+    if spec is None:
+        return 0.0, 24.0
+    if spec == 'night':
+        return float(night_start), float(night_end)
+    if spec == 'day':
+        return float(night_end), float(night_start)
+    if isinstance(spec, (list, tuple)) and len(spec) == 2:
+        return float(spec[0]), float(spec[1])
+    raise ConfigError(f"hours should be 'night', 'day' or [start, end], got {spec!r}")
+
+
+def in_windows(hours: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    # hours is (F, 1) against (R,) windows; a window with start > end wraps past midnight.
+    inside = (hours >= starts) & (hours < ends)
+    wrapped = (hours >= starts) | (hours < ends)
+    return np.where(starts > ends, wrapped, inside)
+
+
+class RulePlan:
+    def __init__(self, rules: List[Dict], class_names: Dict[int, str], night_start: float, night_end: float,
+                 lookup: Callable[[str], Any]):
+        name_to_ids = {}
+        for class_id, name in class_names.items():
+            name_to_ids.setdefault(name.lower(), []).append(int(class_id))
+        class_slots = max(class_names, default=-1) + 2
+
+        parsed = [self._parse(rule, index, night_start, night_end, lookup) for index, rule in enumerate(rules)]
+        # Highest severity first, config order within a severity, so the first rule that fires leads the alert.
+        parsed.sort(key=lambda rule: (-rule['rank'], rule['order']))
+
+        # A level is a detection filter (minimum dwell, zones); a group is a class set counted within one level.
+        levels, groups = {}, {}
+        for rule in parsed:
+            level = levels.setdefault((rule['min_dwell'], rule['zones']), len(levels))
+            rule['group'] = groups.setdefault((rule['classes'], level), len(groups))
+
+        self.zone_names = sorted({zone for _, zones in levels if zones for zone in zones})
+        self.zone_index = {zone: index for index, zone in enumerate(self.zone_names)}
+        self.level_dwell = np.zeros(len(levels), dtype=np.float64)
+        self.level_zoned = np.zeros(len(levels), dtype=bool)
+        self.level_zones = np.zeros((len(self.zone_names), len(levels)), dtype=np.int32)
+        for (min_dwell, zones), level in levels.items():
+            self.level_dwell[level] = min_dwell
+            if zones:
+                self.level_zoned[level] = True
+                self.level_zones[[self.zone_index[zone] for zone in zones], level] = 1
+
+        self.group_level = np.zeros(len(groups), dtype=np.intp)
+        self.group_matrix = np.zeros((class_slots, len(groups)), dtype=np.int64)
+        for (classes, level), group in groups.items():
+            self.group_level[group] = level
+            if classes is None:
+                self.group_matrix[:, group] = 1
+            else:
+                for name in classes:
+                    self.group_matrix[name_to_ids.get(name, []), group] = 1
+
+        self.names = [rule['name'] for rule in parsed]
+        self.alert_types = [rule['alert_type'] for rule in parsed]
+        self.messages = [rule['message'] for rule in parsed]
+        self.cameras = [rule['cameras'] for rule in parsed]
+        self.ranks = np.array([rule['rank'] for rule in parsed], dtype=np.int8)
+        self.thresholds = np.array([rule['threshold'] for rule in parsed], dtype=np.float64)
+        self.starts = np.array([rule['window'][0] for rule in parsed], dtype=np.float64)
+        self.ends = np.array([rule['window'][1] for rule in parsed], dtype=np.float64)
+        self.all_day = (self.starts <= 0.0) & (self.ends >= 24.0)
+        # An unknown hour (NaN) is outside every explicit window, but rules that only exclude one stay on.
+        self.unknown_hour = self.all_day | np.array([rule['complement'] for rule in parsed], dtype=bool)
+        self.rule_group = np.array([rule['group'] for rule in parsed], dtype=np.intp)
+        self.min_duration = np.array([rule['min_duration'] for rule in parsed], dtype=np.float64)
+        self.clear_after = np.array([rule['clear_after'] for rule in parsed], dtype=np.float64)
+        self.clear_margin = np.array([rule['clear_margin'] for rule in parsed], dtype=np.float64)
+
+        # Rules sharing an alert type are raised, cooled down and cleared together.
+        self.type_names = list(dict.fromkeys(self.alert_types))
+        self.rule_type = np.array([self.type_names.index(t) for t in self.alert_types], dtype=np.intp)
+        self.type_cooldown = np.zeros(len(self.type_names), dtype=np.float64)
+        np.maximum.at(self.type_cooldown, self.rule_type, [rule['cooldown'] for rule in parsed])
+        self.type_rank = np.zeros(len(self.type_names), dtype=np.int8)
+        np.maximum.at(self.type_rank, self.rule_type, self.ranks)
+        self.uses_dwell = bool((self.level_dwell > 0).any())
+        self.uses_zones = bool(self.zone_names)
+        self.anomaly = np.array([rule['anomaly'] for rule in parsed], dtype=np.float64)
+        self.uses_anomaly = bool((~np.isnan(self.anomaly)).any())
+        self._camera_masks = {}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @staticmethod
+    def _parse(rule: Dict, index: int, night_start: float, night_end: float, lookup: Callable[[str], Any]) -> Dict:
+        if not isinstance(rule, dict) or 'name' not in rule or 'threshold' not in rule:
+            raise ConfigError(f"alert rule {index} needs at least 'name' and 'threshold'")
+        unknown = set(rule) - RULE_KEYS
+        if unknown:
+            raise ConfigError(f"alert rule '{rule['name']}' has unknown keys: {', '.join(sorted(unknown))}")
+
+        severity = rule.get('severity', 'medium')
+        if severity not in SEVERITIES[1:]:
+            raise ConfigError(f"alert rule '{rule['name']}' severity should be one of {', '.join(SEVERITIES[1:])}")
+
+        threshold = rule['threshold']
+        if isinstance(threshold, str):
+            # Thresholds may name another config value, e.g. "person_threshold".
+            try:
+                threshold = lookup(threshold)
+            except KeyError:
+                raise ConfigError(f"alert rule '{rule['name']}' refers to unknown config value '{threshold}'")
+        if not isinstance(threshold, (int, float)) or isinstance(threshold, bool):
+            raise ConfigError(f"alert rule '{rule['name']}' threshold should be a number")
+
+        classes = rule.get('classes', '*')
+        classes = None if classes == '*' else frozenset(name.lower() for name in classes)
+        cameras = rule.get('cameras')
+        zones = rule.get('zones')
+        anomaly = rule.get('anomaly', np.nan)
+        if not isinstance(anomaly, (int, float)) or isinstance(anomaly, bool):
+            raise ConfigError(f"alert rule '{rule['name']}' anomaly should be a number")
+
+        timing = {}
+        for key, default in (('min_duration', 'alert_min_duration'), ('clear_after', 'alert_clear_after'),
+                             ('clear_margin', 'alert_clear_margin'), ('cooldown', 'alert_cooldown')):
+            value = rule.get(key, lookup(default))
+            if not isinstance(value, (int, float)) or isinstance(value, bool) or value < 0:
+                raise ConfigError(f"alert rule '{rule['name']}' {key} should be a non-negative number")
+            timing[key] = float(value)
+
+        return {
+            **timing,
+            'name': rule['name'],
+            'order': index,
+            'alert_type': rule.get('alert_type', rule['name']),
+            'rank': SEVERITIES.index(severity),
+            'classes': classes,
+            'window': hour_window(rule.get('hours'), night_start, night_end),
+            'complement': rule.get('hours') == 'day',
+            'threshold': threshold,
+            'min_dwell': float(rule.get('min_dwell', 0.0)),
+            'zones': frozenset(zones) if zones else None,
+            'anomaly': float(anomaly),
+            'cameras': frozenset(cameras) if cameras else None,
+            'message': rule.get('message', DEFAULT_MESSAGE)
+        }
+
+    def camera_mask(self, camera: str) -> np.ndarray:
+        mask = self._camera_masks.get(camera)
+        if mask is None:
+            mask = np.array([cameras is None or camera in cameras for cameras in self.cameras], dtype=bool)
+            self._camera_masks[camera] = mask
+        return mask
+
+    def active(self, hours: np.ndarray, cameras: Sequence[str] = None) -> np.ndarray:
+        hours = np.asarray(hours, dtype=np.float64)[:, None]
+        active = np.where(np.isnan(hours), self.unknown_hour, in_windows(hours, self.starts, self.ends) | self.all_day)
+        if cameras is not None:
+            unique, inverse = np.unique(np.asarray(cameras, dtype=object).astype(str), return_inverse=True)
+            masks = np.array([self.camera_mask(camera) for camera in unique]).reshape(len(unique), len(self))
+            active &= masks[inverse]
+        return active
+
+    def zone_matrix(self, detection_zones: List[List[str]]) -> np.ndarray:
+        # (detections, plan zones) membership from each detection's zone names; zones no rule uses are ignored.
+        matrix = np.zeros((len(detection_zones), len(self.zone_names)), dtype=np.int32)
+        for row, zones in enumerate(detection_zones):
+            for zone in zones:
+                column = self.zone_index.get(zone)
+                if column is not None:
+                    matrix[row, column] = 1
+        return matrix
+
+    def level_members(self, detections: int, dwell: np.ndarray = None, zones: np.ndarray = None) -> np.ndarray:
+        members = np.ones((detections, len(self.level_dwell)), dtype=bool)
+        if self.uses_dwell and dwell is not None:
+            members &= dwell[:, None] >= self.level_dwell
+        if self.uses_zones:
+            inside = zones @ self.level_zones > 0 if zones is not None else False
+            members &= inside | ~self.level_zoned
+        return members
+
+    def group_counts(self, class_ids: np.ndarray, frame_index: np.ndarray, frames: int,
+                     dwell: np.ndarray = None, zones: np.ndarray = None) -> np.ndarray:
+        slots = self.group_matrix.shape[0]
+        size = frames * slots
+        keys = frame_index * slots + np.minimum(class_ids, slots - 1)
+        members = self.level_members(len(keys), dwell, zones)
+        levels = members.shape[1]
+
+        # One class histogram per level, shared by every class set counted at that level.
+        if levels * size <= MAX_HISTOGRAM:
+            level, detection = np.nonzero(members.T)
+            histogram = np.bincount(level * size + keys[detection], minlength=levels * size)
+            per_level = np.einsum('lfc,cg->lfg', histogram.reshape(levels, frames, slots), self.group_matrix)
+            return per_level[self.group_level, :, np.arange(len(self.group_level))].T
+
+        counts = np.zeros((frames, len(self.group_level)), dtype=np.int64)
+        for level in range(levels):
+            groups = np.flatnonzero(self.group_level == level)
+            histogram = np.bincount(keys[members[:, level]], minlength=size).reshape(frames, slots)
+            counts[:, groups] = histogram @ self.group_matrix[:, groups]
+        return counts
+
+    def evaluate(self, class_ids: np.ndarray, frame_index: np.ndarray, hours: np.ndarray,
+                 cameras: Sequence[str] = None, dwell: np.ndarray = None, zones: np.ndarray = None,
+                 sticky: np.ndarray = None, scores: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
+        # sticky marks rules that are already raised; they keep firing down to threshold - clear_margin.
+        # scores is a (frames, classes) baseline anomaly score; without it anomaly rules never fire.
+        frames = len(hours)
+        fired = np.zeros((frames, len(self)), dtype=bool)
+        rule_counts = np.zeros((frames, len(self)), dtype=np.int64)
+        if frames == 0 or len(self) == 0:
+            return fired, rule_counts
+
+        # Cheapest checks first: time window and camera, then whether any frame has enough detections at all.
+        active = self.active(hours, cameras)
+        if not active.any():
+            return fired, rule_counts
+        thresholds = self.thresholds if sticky is None else np.where(sticky, self.thresholds - self.clear_margin,
+                                                                     self.thresholds)
+        totals = np.bincount(frame_index, minlength=frames)
+        lowest = np.where(active, thresholds, np.inf).min(axis=1)
+        if not (totals > lowest).any():
+            return fired, rule_counts
+
+        counts = self.group_counts(class_ids, frame_index, frames, dwell, zones)
+        rule_counts = counts[:, self.rule_group]
+        fired = active & (rule_counts > thresholds)
+        if self.uses_anomaly:
+            fired &= np.isnan(self.anomaly) | (self.rule_scores(scores, frames) >= self.anomaly)
+        return fired, rule_counts
+
+    def rule_scores(self, scores: np.ndarray, frames: int) -> np.ndarray:
+        # A rule's score is the highest score among the classes it counts.
+        slots = self.group_matrix.shape[0]
+        aligned = np.zeros((frames, slots), dtype=np.float64)
+        if scores is not None:
+            scores = np.asarray(scores, dtype=np.float64).reshape(frames, -1)[:, :slots]
+            aligned[:, :scores.shape[1]] = scores
+        group_scores = np.where(self.group_matrix.T[None, :, :] > 0, aligned[:, None, :], 0.0).max(axis=2)
+        return group_scores[:, self.rule_group]
+
+    def describe(self, rule: int, count: int) -> Dict[str, Any]:
+        threshold = self.thresholds[rule]
+        threshold = int(threshold) if threshold == int(threshold) else float(threshold)
+        return {
+            'type': self.names[rule],
+            'message': self.messages[rule].format(name=self.names[rule], count=int(count), threshold=threshold),
+            'severity': SEVERITIES[self.ranks[rule]]
+        }
@@ -1,37 +1,196 @@
-import json
+import time
+import numpy as np
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 from helper import load_json_variable
+from config import get_config
+from alert_rules import RulePlan, SEVERITIES
+from alert_aggregator import AlertAggregator, RAISED
+from baseline import Baseline
+from vision_logging import get_logger
+
+log = get_logger("alert_system")
+
+PERSON, VEHICLE, OTHER = 0, 1, 2
+CATEGORY_COUNT = 3
+
+ALERT_DTYPE = np.dtype([
+    ("should_alert", np.bool_),
+    ("severity", np.int8),
+    ("rule", np.int16),
+    ("is_night", np.bool_),
+    ("person_count", np.int32),
+    ("vehicle_count", np.int32),
+    ("total_detections", np.int32),
+])
+
+
+def hour_of_day(timestamp) -> float:
+    if isinstance(timestamp, (int, float)):
+        # Epoch seconds, as stored by the event store.
+        local = time.localtime(timestamp)
+        return local.tm_hour + local.tm_min / 60.0
+    dt = timestamp if isinstance(timestamp, datetime) else datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+    return dt.hour + dt.minute / 60.0
+
 
 class AlertSystem:
-    
-    def __init__(self):
+
+    def __init__(self, class_names: Dict[int, str] = None, rules: List[Dict] = None, baseline: Baseline = None):
         self.night_start = load_json_variable('night_start')
         self.night_end = load_json_variable('night_end')
+        self.rules = rules if rules is not None else load_json_variable('alert_rules')
         self.vehicle_classes = ['car', 'truck', 'bus', 'motorcycle', 'bicycle']
-    
+        self.class_names = {}
+        self.category_map = np.full(1, OTHER, dtype=np.intp)
+        self.plan = None
+        self.baseline = baseline
+        self.aggregator = AlertAggregator() if load_json_variable('alert_aggregation') else None
+        if class_names:
+            self.set_class_names(class_names)
+        else:
+            self.compile_rules()
+        get_config().subscribe(self.apply_config, keys=['night_start', 'night_end', 'person_threshold', 'alert_rules',
+                                                        'alert_min_duration', 'alert_clear_after', 'alert_clear_margin',
+                                                        'alert_cooldown'])
+
+    def apply_config(self, changed: Dict[str, Any]):
+        night_start = changed.get('night_start', self.night_start)
+        night_end = changed.get('night_end', self.night_end)
+        rules = changed.get('alert_rules', self.rules)
+        # Compile before swapping anything, so a broken rule set keeps the previous plan running.
+        plan = RulePlan(rules, self.class_names, night_start, night_end, load_json_variable)
+        self.night_start, self.night_end, self.rules, self.plan = night_start, night_end, rules, plan
+
+    def compile_rules(self):
+        self.plan = RulePlan(self.rules, self.class_names, self.night_start, self.night_end, load_json_variable)
+
+    def set_class_names(self, class_names: Dict[int, str]):
+        class_names = {int(class_id): name.lower() for class_id, name in class_names.items()}
+        # One slot per class id plus a trailing OTHER slot for ids the model never declared.
+        category_map = np.full(max(class_names) + 2, OTHER, dtype=np.intp)
+        for class_id, name in class_names.items():
+            if name == 'person':
+                category_map[class_id] = PERSON
+            elif name in self.vehicle_classes:
+                category_map[class_id] = VEHICLE
+        self.class_names = class_names
+        self.category_map = category_map
+        self.compile_rules()
+
+    def categories(self, class_ids: np.ndarray) -> np.ndarray:
+        return self.category_map[np.minimum(class_ids, len(self.category_map) - 1)]
+
+    def is_night(self, hours):
+        hours = np.asarray(hours, dtype=np.float64)
+        if self.night_start > self.night_end:
+            return (hours >= self.night_start) | (hours < self.night_end)
+        return (hours >= self.night_start) & (hours < self.night_end)
+
     def is_night_time(self, timestamp: str) -> bool:
         try:
-            dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-            hour = dt.hour
-            
-            if self.night_start > self.night_end:
-                return hour >= self.night_start or hour < self.night_end
-            else:
-                return self.night_start <= hour < self.night_end
-                
+            return bool(self.is_night(hour_of_day(timestamp)))
         except Exception as e:
-            print(f"Error parsing timestamp {timestamp}: {e}")
+            log.warning("could not parse timestamp", timestamp=timestamp, error=e)
             return False
-    
+
     def count_objects_by_type(self, detections: List[Dict]) -> Dict[str, int]:
         counts = {}
         for detection in detections:
             class_name = detection.get('class_name', '').lower()
             counts[class_name] = counts.get(class_name, 0) + 1
         return counts
-    
-    def analyze_detections(self, detections: List[Dict], timestamp: str) -> Dict[str, Any]:
+
+    def evaluate_batch(self, class_ids: np.ndarray, frame_index: np.ndarray, hours: np.ndarray,
+                       cameras: List[str] = None, dwell: np.ndarray = None, zones: np.ndarray = None,
+                       sticky: np.ndarray = None, scores: np.ndarray = None, plan: RulePlan = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # class_ids, frame_index, dwell and zones (a membership matrix over plan.zone_names) are per-detection;
+        # hours and cameras hold one value per frame.
+        # Returns the per-frame summary plus the (frames, rules) fired and count matrices from the rule plan.
+        plan = plan or self.plan
+        hours = np.asarray(hours, dtype=np.float64)
+        frames = len(hours)
+        results = np.zeros(frames, dtype=ALERT_DTYPE)
+        class_ids = np.asarray(class_ids, dtype=np.intp)
+        frame_index = np.asarray(frame_index, dtype=np.intp)
+
+        fired, rule_counts = plan.evaluate(class_ids, frame_index, hours, cameras, dwell, zones, sticky, scores)
+        if frames == 0:
+            return results, fired, rule_counts
+
+        keys = frame_index * CATEGORY_COUNT + self.categories(class_ids)
+        counts = np.bincount(keys, minlength=frames * CATEGORY_COUNT).reshape(frames, CATEGORY_COUNT)
+
+        any_fired = fired.any(axis=1)
+        # Rules are ordered by severity, so the first one that fired leads the alert; -1 picks the trailing 'none'.
+        leading = np.where(any_fired, fired.argmax(axis=1), -1)
+        results['should_alert'] = any_fired
+        results['rule'] = leading
+        results['severity'] = np.append(plan.ranks, 0)[leading]
+        results['is_night'] = self.is_night(hours)
+        results['person_count'] = counts[:, PERSON]
+        results['vehicle_count'] = counts[:, VEHICLE]
+        results['total_detections'] = counts.sum(axis=1)
+        return results, fired, rule_counts
+
+    def evaluate_records(self, records: np.ndarray, hour: float, camera: str = None) -> Dict[str, Any]:
+        results, fired, rule_counts = self.evaluate_batch(records['class_id'], np.zeros(len(records), dtype=np.intp),
+                                                          [hour], None if camera is None else [camera])
+        return self.to_alert_data(results[0], fired[0], rule_counts[0], None)
+
+    def replay_events(self, events: List[Dict]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        sizes = [len(event['class_ids']) for event in events]
+        class_ids = np.concatenate([event['class_ids'] for event in events]) if events else np.zeros(0, dtype=np.intp)
+        frame_index = np.repeat(np.arange(len(events)), sizes)
+        hours = [hour_of_day(event['ts']) for event in events]
+        cameras = [event.get('camera', 'default') for event in events]
+        return self.evaluate_batch(class_ids, frame_index, hours, cameras)
+
+    def _register_classes(self, detections: List[Dict], class_ids: np.ndarray):
+        # Only needed when the alert system was built without the model's class names.
+        if len(class_ids) and class_ids.max() >= len(self.category_map) - 1:
+            unknown = {d['class_id']: d['class_name'] for d in detections if d['class_id'] not in self.class_names}
+            if unknown:
+                self.set_class_names({**self.class_names, **unknown})
+
+    def _frame_inputs(self, detections: List[Dict], timestamp: str, hour: float, camera: str = None):
+        if hour is None:
+            try:
+                hour = hour_of_day(timestamp)
+            except Exception as e:
+                log.warning("could not parse timestamp", timestamp=timestamp, error=e)
+                hour = np.nan
+
+        class_ids = np.fromiter((d['class_id'] for d in detections), dtype=np.intp, count=len(detections))
+        self._register_classes(detections, class_ids)
+        dwell = zones = None
+        if self.plan.uses_dwell:
+            dwell = np.fromiter((d.get('dwell', 0.0) for d in detections), dtype=np.float64, count=len(detections))
+        if self.plan.uses_zones:
+            zones = self.plan.zone_matrix([d.get('zones', ()) for d in detections])
+
+        scores = None
+        if self.baseline is not None and camera is not None:
+            try:
+                scores = self.baseline.scores(camera, timestamp, class_ids)[None, :]
+            except ValueError:
+                pass
+
+        class_counts = np.bincount(class_ids)
+        object_counts = {self.class_names.get(class_id, str(class_id)): int(class_counts[class_id])
+                         for class_id in np.flatnonzero(class_counts).tolist()}
+        return class_ids, dwell, zones, scores, hour, object_counts
+
+    def _add_anomaly(self, alert_data: Dict[str, Any], scores: np.ndarray, class_ids: np.ndarray):
+        if scores is not None and len(class_ids):
+            present = np.unique(class_ids)
+            present = present[present < scores.shape[1]]
+            if len(present):
+                alert_data['details']['anomaly_score'] = round(float(scores[0, present].max()), 2)
+        return alert_data
+
+    def analyze_detections(self, detections: List[Dict], timestamp: str, hour: float = None,
+                           camera: str = None) -> Dict[str, Any]:
         if not detections:
             return {
                 'should_alert': False,
@@ -41,60 +200,60 @@ class AlertSystem:
                 'details': {},
                 'timestamp': timestamp
             }
-        
-        object_counts = self.count_objects_by_type(detections)
-        person_count = object_counts.get('person', 0)
-        is_night = self.is_night_time(timestamp)
-        
-        vehicle_count = sum(object_counts.get(vehicle, 0) for vehicle in self.vehicle_classes)
-        
-        alerts = []
-        severity = 'none'
-        alert_type = 'none'
-        
-        if is_night:
-            if person_count > 3:
-                alerts.append({
-                    'type': 'night_person_count',
-                    'message': f'Night time: {person_count} persons detected (threshold: 3)',
-                    'severity': 'high'
-                })
-                severity = 'high'
-                alert_type = 'night_intrusion'
-        
-        else:
-            if person_count > 7:
-                alerts.append({
-                    'type': 'day_person_count', 
-                    'message': f'Day time: {person_count} persons detected (threshold: 7)',
-                    'severity': 'medium'
-                })
-                severity = 'medium'
-                alert_type = 'crowd_detection'
-        
-        if vehicle_count > 5:
-            alerts.append({
-                'type': 'vehicle_count',
-                'message': f'{vehicle_count} vehicles detected (threshold: 5)',
-                'severity': 'medium'
-            })
-            if severity == 'none':
-                severity = 'medium'
-            if alert_type == 'none':
-                alert_type = 'traffic'
-        
-        should_alert = len(alerts) > 0
-        
+
+        class_ids, dwell, zones, scores, hour, object_counts = self._frame_inputs(detections, timestamp, hour, camera)
+        plan = self.plan
+        results, fired, rule_counts = self.evaluate_batch(class_ids, np.zeros(len(class_ids), dtype=np.intp), [hour],
+                                                          None if camera is None else [camera], dwell, zones,
+                                                          scores=scores, plan=plan)
+        alert_data = self.to_alert_data(results[0], fired[0], rule_counts[0], timestamp, object_counts, plan)
+        return self._add_anomaly(alert_data, scores, class_ids)
+
+    def observe(self, detections: List[Dict], timestamp: str, camera: str, hour: float = None,
+                now: float = None) -> Dict[str, Any]:
+        # Stateful counterpart of analyze_detections for live streams: call it for every processed frame, empty ones
+        # included, and it only reports an alert when an alert type is raised after min_duration and cooldown.
+        if self.aggregator is None:
+            alert_data = self.analyze_detections(detections, timestamp, hour, camera)
+            alert_data['transitions'] = []
+            return alert_data
+
+        now = time.monotonic() if now is None else now
+        class_ids, dwell, zones, scores, hour, object_counts = self._frame_inputs(detections, timestamp, hour, camera)
+        plan = self.plan
+        state = self.aggregator.state(camera, plan)
+        results, fired, rule_counts = self.evaluate_batch(class_ids, np.zeros(len(class_ids), dtype=np.intp), [hour],
+                                                          [camera], dwell, zones, state.raised[None, :], scores, plan)
+        transitions = self.aggregator.update(camera, plan, fired[0], now)
+
+        raised = [plan.type_names.index(t['alert_type']) for t in transitions if t['transition'] == RAISED]
+        announce = fired[0] & np.isin(plan.rule_type, raised)
+        alert_data = self.to_alert_data(results[0], announce, rule_counts[0], timestamp, object_counts, plan)
+        alert_data['transitions'] = transitions
+        alert_data['details']['active_alerts'] = self.aggregator.active_types(camera)
+        return self._add_anomaly(alert_data, scores, class_ids)
+
+    def to_alert_data(self, result: np.ndarray, fired: np.ndarray, rule_counts: np.ndarray, timestamp: str,
+                      object_counts: Dict[str, int] = None, plan: RulePlan = None) -> Dict[str, Any]:
+        plan = plan or self.plan
+        person_count = int(result['person_count'])
+        vehicle_count = int(result['vehicle_count'])
+        is_night = bool(result['is_night'])
+        rules = np.flatnonzero(fired).tolist()
+        alerts = [plan.describe(rule, rule_counts[rule]) for rule in rules]
+
+        # Rules are ordered by severity, so the first reported one sets the severity and alert type.
+        should_alert = bool(rules)
         if should_alert:
             time_period = 'Night' if is_night else 'Day'
             summary = f"{time_period} alert: {len(alerts)} threshold(s) exceeded"
         else:
             summary = f"Normal activity - {person_count} persons, {vehicle_count} vehicles"
-        
+
         return {
             'should_alert': should_alert,
-            'severity': severity,
-            'alert_type': alert_type,
+            'severity': SEVERITIES[plan.ranks[rules[0]]] if should_alert else 'none',
+            'alert_type': plan.alert_types[rules[0]] if should_alert else 'none',
             'summary': summary,
             'message': summary,
             'alerts': alerts,
@@ -102,22 +261,22 @@ class AlertSystem:
                 'is_night': is_night,
                 'person_count': person_count,
                 'vehicle_count': vehicle_count,
-                'object_counts': object_counts,
-                'total_detections': len(detections)
+                'object_counts': object_counts or {},
+                'total_detections': int(result['total_detections'])
             },
             'timestamp': timestamp
         }
-    
+
     def format_alert_message(self, alert_data: Dict) -> str:
         if not alert_data.get('should_alert', False):
             return alert_data.get('summary', 'No alerts')
-        
+
         message = f"{alert_data.get('summary', 'Alert')}\n"
-        
+
         for alert in alert_data.get('alerts', []):
             message += f"{alert['message']}\n"
-        
+
         details = alert_data.get('details', {})
         message += f"\nDetails: {details['person_count']} persons, {details['vehicle_count']} vehicles"
-        
+
         return message.strip()
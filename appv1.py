@@ -12,11 +12,15 @@ import time
 import numpy as np
 import threading
 from vision import Vision
-from summary import Summary
+from camera_supervisor import CameraSupervisor
+from event_store import create_event_store
+from event_feed import EventFeed
+from metrics import REGISTRY, STAGE_SECONDS
+from summary import Summary, LIVE_SUMMARIES
 from llava.model.builder import load_pretrained_model
 from llava.utils import disable_torch_init
 from helper import device, load_json_variable
-from transformers import LlavaNextProcessor, LlavaNextForConditionalGeneration, BitsAndBytesConfig
+from model_registry import acquire_llava, acquire_yolo
 
 st.set_page_config(
     page_title="VisionSense AI Dashboard",
@@ -66,95 +70,98 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 @st.cache_resource
-def load_llava_model():
-    with st.spinner("Loading Model"):
-        disable_torch_init()
-        model_path = "llava-hf/llava-v1.6-mistral-7b-hf"
-        try:
-            quantization_config = BitsAndBytesConfig(
-                load_in_4bit=True,
-                bnb_4bit_compute_dtype=torch.float16,
-                bnb_4bit_use_double_quant=True,
-                bnb_4bit_quant_type="nf4"
-            )
-            
-            processor = LlavaNextProcessor.from_pretrained(model_path)
-            model = LlavaNextForConditionalGeneration.from_pretrained(
-                model_path, 
-                dtype=torch.float16, 
-                low_cpu_mem_usage=True,
-                device_map="auto",
-                quantization_config=quantization_config
-            )
-            
-            if hasattr(torch, 'compile'):
-                model = torch.compile(model, mode="reduce-overhead")
-            
-            return {
-                'tokenizer': processor.tokenizer,
-                'model': model,
-                'image_processor': processor.image_processor,
-                'context_len': 4096,
-                'processor': processor
-            }
-        except Exception as e:
-            st.error(f"Error loading LLaVA model: {e}")
-            return None
+def get_llava_model():
+    # Held for the life of the process; detection and the dashboard run while it finishes loading.
+    return acquire_llava(load_json_variable("model_path"))[1]
+
+@st.cache_resource
+def get_detection_model():
+    # Keeps the YOLO weights in the registry between camera restarts, so each new Vision shares them.
+    return acquire_yolo(load_json_variable("model"))[1]
+
+ALL_CAMERAS = "All configured cameras"
 
-def start_camera_stream(vision_system, camera_source, status_callback=None):
+def start_camera_stream(vision_system, camera_source, status_callback=None, llava_model=None):
     print("Starting camera stream")
-    
-    llava_model_components = load_llava_model()
-    
-    if llava_model_components:
-        summary_model = Summary(llava_model_components)
-        print("Summary model loaded.")
 
+    owned = vision_system is None
+    if owned:
         vision_system = Vision(model_name=load_json_variable("model"), 
                                confidence_threshold=load_json_variable("confidence_threshold"), 
                                stream=load_json_variable("stream"), 
-                               summary_model=summary_model)
-        
+                               summary_model=Summary(llava_model or get_llava_model()))
+    
+    if camera_source == ALL_CAMERAS:
+        CameraSupervisor(vision_system).run()
+    else:
         vision_system.process_viewpoint(camera_source)
-        print("Camera stream finished.")
-        
+    # A Vision passed in belongs to the caller and stays usable for the next start.
+    if owned:
+        vision_system.close()
     else:
-        print("Could not load LLaVA model, exiting camera stream.")
+        vision_system.flush()
+    print("Camera stream finished.")
     
         
 
-def get_csv_data():
+EVENT_COLUMNS = ['timestamp', 'camera', 'summary', 'alert_status', 'alert_severity', 'alert_type',
+                 'alert_message', 'alert_details_json']
+
+@st.cache_resource
+def get_event_store():
+    return create_event_store()
+
+@st.cache_resource
+def get_event_feed():
+    return EventFeed(get_event_store(), capacity=load_json_variable("feed_capacity"))
+
+def events_to_dataframe(events):
+    rows = [{
+        'timestamp': event['timestamp'],
+        'camera': event['camera'],
+        'summary': event['summary'],
+        'alert_status': event['alert_status'],
+        'alert_severity': event['alert_severity'],
+        'alert_type': event['alert_type'],
+        'alert_message': event['alert_message'],
+        'alert_details_json': json.dumps(event['alert_details'])
+    } for event in events]
+    return pd.DataFrame(rows, columns=EVENT_COLUMNS)
+
+def get_event_data(limit=None, alert_status=None, start=None, end=None):
     try:
-        csv_filename = load_json_variable("csv_filename")
-        if not os.path.exists(csv_filename):
-            return pd.DataFrame()
-        
-        df = pd.read_csv(csv_filename)
-        
-        if not df.empty:
-            available_columns = df.columns.tolist()
-            
-            columns_to_keep = ['timestamp', 'summary']
-            
-            alert_columns = ['alert_status', 'alert_severity', 'alert_type', 'alert_message', 'alert_details_json']
-            for col in alert_columns:
-                if col in available_columns:
-                    columns_to_keep.append(col)
-            
-            df = df[columns_to_keep].copy()
-            
-            if 'alert_status' in df.columns:
-                df['alert_status'] = df['alert_status'].map({'true': True, 'false': False})
-                df['alert_status'] = df['alert_status'].fillna(False)
-            
-            df = df.sort_values('timestamp', ascending=False)
-        
-        return df
+        if start is None and end is None:
+            events = get_event_feed().latest(limit, alert_status=alert_status)
+        else:
+            events = get_event_store().range(start, end, alert_status=alert_status, limit=limit)
+        return events_to_dataframe(events)
         
     except Exception as e:
-        st.error(f"Error reading CSV file: {e}")
+        st.error(f"Error reading event store: {e}")
         return pd.DataFrame()
 
+def get_metrics_data():
+    stage_rows = []
+    for (stage,), series in sorted(STAGE_SECONDS.series().items()):
+        quantiles = series.quantiles()
+        stage_rows.append({
+            'stage': stage,
+            'count': series.count,
+            'p50_ms': round(quantiles[0.5] * 1000, 2),
+            'p95_ms': round(quantiles[0.95] * 1000, 2),
+            'p99_ms': round(quantiles[0.99] * 1000, 2)
+        })
+
+    value_rows = []
+    for metric in REGISTRY.metrics():
+        if metric is STAGE_SECONDS:
+            continue
+        for values, series in sorted(metric.series().items()):
+            labels = ", ".join(f"{name}={value}" for name, value in zip(metric.label_names, values))
+            value_rows.append({'metric': metric.name, 'labels': labels, 'value': series.get()})
+
+    return pd.DataFrame(stage_rows), pd.DataFrame(value_rows)
+
 def display_alert_status(row):
     if 'alert_status' in row and row['alert_status']:
         severity = row.get('alert_severity', 'medium')
@@ -199,18 +206,25 @@ def main():
     if 'camera_active' not in st.session_state:
         st.session_state.camera_active = False
 
+    llava_model = get_llava_model()
+    get_detection_model()
+
     with st.sidebar:
         st.header("Control Panel")
+        st.caption(f"Summary model: {llava_model.state}")
         
         st.subheader("Camera Control")
-        camera_source = st.selectbox("Camera Source", [0, 1, 2], index=0)
+        configured_sources = [camera['source'] for camera in load_json_variable("cameras")]
+        camera_options = [0, 1, 2] + [source for source in configured_sources if source not in (0, 1, 2)] + [ALL_CAMERAS]
+        camera_source = st.selectbox("Camera Source", camera_options, index=0)
         
         col_start, col_stop = st.columns(2)
         with col_start:
             if st.button("Start Camera", disabled=st.session_state.camera_active):
                 st.session_state.camera_active = True
+                vision_system = st.session_state.vision_system
                 def start_camera_thread():
-                    start_camera_stream(None, camera_source)
+                    start_camera_stream(vision_system, camera_source, llava_model=llava_model)
                     st.session_state.camera_active = False
                 
                 camera_thread = threading.Thread(target=start_camera_thread, daemon=True)
@@ -224,7 +238,13 @@ def main():
                 st.info("Close the camera window or press 'q' to stop streaming.")
                 st.rerun()
 
-    tab1, tab2, tab3 = st.tabs(["Live Detection", "Event History", "Memory Viewer"])
+    try:
+        # One incremental read per rerun; every tab below works off the shared in-memory ring.
+        get_event_feed().refresh()
+    except Exception as e:
+        st.error(f"Error reading event store: {e}")
+
+    tab1, tab2, tab3, tab4 = st.tabs(["Live Detection", "Event History", "Memory Viewer", "Metrics"])
     
     with tab1:
         st.header("Live Camera Detection")
@@ -235,8 +255,13 @@ def main():
         
         with col2:
             st.subheader("Live Status")
+
+            # Summaries still being generated show up here before they reach the event store.
+            for camera, live in LIVE_SUMMARIES.snapshot().items():
+                if not live['done'] and st.session_state.camera_active:
+                    st.write(f"**Generating ({camera}):** {live['summary']}…")
             
-            df = get_csv_data()
+            df = get_event_data(limit=1)
             if not df.empty and st.session_state.camera_active:
                 latest_event = df.iloc[0]
                 
@@ -253,33 +278,23 @@ def main():
                     st.info("Waiting for detection data...")
                 else:
                     st.info("Start camera to see live status")
-            
-            if st.session_state.camera_active:
-                time.sleep(2)
-                st.rerun()
+
     
     
     
     with tab2:
         st.header("Event History")
         
-        df = get_csv_data()
+        col1, col2 = st.columns(2)
+        with col1:
+            limit = st.selectbox("Show Last N Events", [10, 25, 50, 100], index=1)
+        with col2:
+            alert_filter = st.selectbox("Filter by Alert Status", ["All", "Alerts Only", "Normal Only"])
         
-        if not df.empty:
-            col1, col2 = st.columns(2)
-            with col1:
-                limit = st.selectbox("Show Last N Events", [10, 25, 50, 100], index=1)
-            with col2:
-                alert_filter = st.selectbox("Filter by Alert Status", ["All", "Alerts Only", "Normal Only"])
-            
-            filtered_df = df.copy()
-            if alert_filter == "Alerts Only" and 'alert_status' in df.columns:
-                filtered_df = filtered_df[filtered_df['alert_status'] == True]
-            elif alert_filter == "Normal Only" and 'alert_status' in df.columns:
-                filtered_df = filtered_df[filtered_df['alert_status'] == False]
-            
-            filtered_df = filtered_df.head(limit)
-            
+        alert_status = {"All": None, "Alerts Only": True, "Normal Only": False}[alert_filter]
+        filtered_df = get_event_data(limit=limit, alert_status=alert_status)
+        
+        if not filtered_df.empty:
             st.subheader("Recent Events")
             
             for idx, row in filtered_df.iterrows():
@@ -305,42 +320,62 @@ def main():
                         display_alert_status(row)
         else:
             st.info("No events recorded yet.")
-        if st.session_state.camera_active:
-            time.sleep(2)
-            st.rerun()
     
     with tab3:
-        st.header("CSV File Viewer")
+        st.header("Event Store Viewer")
         
         try:
-            csv_filename = load_json_variable("csv_filename")
-            print("csv_filename:", csv_filename)
-            if os.path.exists(csv_filename):
-                df = get_csv_data()
+            feed = get_event_feed()
+            
+            if feed.total:
+                earliest, latest = feed.first_timestamp, feed.last_timestamp()
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.metric("Total Records", feed.total)
+                with col2:
+                    st.metric("Time Range", f"{earliest[:10]} to {latest[:10]}")
+                
+                start_date, end_date = st.columns(2)
+                with start_date:
+                    start = st.date_input("From", datetime.fromisoformat(earliest).date())
+                with end_date:
+                    end = st.date_input("To", datetime.fromisoformat(latest).date())
+                
+                df = get_event_data(limit=1000,
+                                    start=datetime.combine(start, datetime.min.time()),
+                                    end=datetime.combine(end, datetime.max.time()))
+                
+                st.subheader("Stored Events")
+                st.dataframe(df, use_container_width=True)
                 
-                if not df.empty:
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        st.metric("Total Records", len(df))
-                    with col2:
-                        if not df.empty:
-                            earliest = df['timestamp'].min()
-                            latest = df['timestamp'].max()
-                            st.metric("Time Range", f"{earliest[:10]} to {latest[:10]}")
-                    
-                    st.subheader("CSV File Content")
-                    st.dataframe(df, use_container_width=True)
-                    
-                else:
-                    st.info("CSV file is empty.")
             else:
-                st.info("CSV file not found. Start the camera to generate data.")
+                st.info("No events stored yet. Start the camera to generate data.")
             
         except Exception as e:
-            st.error(f"Error accessing CSV file: {e}")
-        if st.session_state.camera_active:
-            time.sleep(2)
-            st.rerun()
+            st.error(f"Error accessing event store: {e}")
+
+    with tab4:
+        st.header("Pipeline Metrics")
+        
+        stage_df, value_df = get_metrics_data()
+        if not stage_df.empty:
+            st.subheader("Stage Latency")
+            st.dataframe(stage_df, use_container_width=True)
+        else:
+            st.info("No timings yet. Start the camera to collect metrics.")
+        
+        if not value_df.empty:
+            st.subheader("Counters and Gauges")
+            st.dataframe(value_df, use_container_width=True)
+        
+        port = load_json_variable("metrics_port")
+        if port:
+            st.caption(f"Prometheus endpoint: http://127.0.0.1:{port}/metrics")
+
+    # A single refresh point, so every tab renders before the page reruns.
+    if st.session_state.camera_active:
+        time.sleep(2)
+        st.rerun()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
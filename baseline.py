@@ -0,0 +1,119 @@
+import os
+import threading
+import time
+import numpy as np
+from datetime import datetime
+from typing import Dict
+from vision_logging import get_logger
+
+log = get_logger("baseline")
+
+HOURS_PER_WEEK = 168
+DAY_SECONDS = 86400.0
+
+
+def hour_of_week(value) -> int:
+    if isinstance(value, (int, float)):
+        local = time.localtime(value)
+        return local.tm_wday * 24 + local.tm_hour
+    dt = value if isinstance(value, datetime) else datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return dt.weekday() * 24 + dt.hour
+
+
+class Baseline:
+    def __init__(self, class_slots: int, max_count: int = 31, min_samples: int = 20):
+        # Per camera: (hour of week, class, count) histogram of how many of each class a recorded frame held.
+        # Counts at or above max_count share the last bin, so memory is fixed however long the history gets.
+        self.class_slots = class_slots
+        self.max_count = max_count
+        self.min_samples = min_samples
+        self.histograms: Dict[str, np.ndarray] = {}
+        self.watermark = 0.0
+        self._classes = np.arange(class_slots)
+        self._lock = threading.Lock()
+
+    def _histogram(self, camera: str) -> np.ndarray:
+        histogram = self.histograms.get(camera)
+        if histogram is None:
+            histogram = np.zeros((HOURS_PER_WEEK, self.class_slots, self.max_count + 1), dtype=np.uint32)
+            self.histograms[camera] = histogram
+        return histogram
+
+    def _counts(self, class_ids: np.ndarray) -> np.ndarray:
+        class_ids = np.minimum(np.asarray(class_ids, dtype=np.intp), self.class_slots - 1)
+        return np.minimum(np.bincount(class_ids, minlength=self.class_slots), self.max_count)
+
+    def update(self, camera: str, ts: float, class_ids: np.ndarray):
+        counts = self._counts(class_ids)
+        with self._lock:
+            self._histogram(camera)[hour_of_week(ts), self._classes, counts] += 1
+            self.watermark = max(self.watermark, ts)
+
+    def update_event(self, event: Dict):
+        self.update(event.get('camera', 'default'), event['ts'], event['class_ids'])
+
+    def samples(self, camera: str, ts) -> int:
+        histogram = self.histograms.get(camera)
+        return 0 if histogram is None else int(histogram[hour_of_week(ts), 0].sum())
+
+    def scores(self, camera: str, ts, class_ids: np.ndarray) -> np.ndarray:
+        # Per class: -log10 of how often this hour of the week has seen at least this many, with add-one smoothing.
+        # 0 means ordinary (or too little history to tell); 3 means rarer than one frame in a thousand.
+        scores = np.zeros(self.class_slots, dtype=np.float64)
+        histogram = self.histograms.get(camera)
+        if histogram is None:
+            return scores
+        with self._lock:
+            hour = histogram[hour_of_week(ts)].astype(np.int64)
+        samples = hour[0].sum()
+        if samples < self.min_samples:
+            return scores
+
+        at_least = np.cumsum(hour[:, ::-1], axis=1)[:, ::-1]
+        seen = at_least[self._classes, self._counts(class_ids)]
+        return -np.log10((seen + 1.0) / (samples + 1.0))
+
+    def catch_up(self, store, chunk: float = DAY_SECONDS) -> int:
+        # Streams everything the store recorded after the watermark, one day at a time.
+        bounds = store.time_bounds()
+        if bounds is None:
+            return 0
+        first = datetime.fromisoformat(bounds[0].replace('Z', '+00:00')).timestamp()
+        last = datetime.fromisoformat(bounds[1].replace('Z', '+00:00')).timestamp()
+        start = max(first, self.watermark)
+        added = 0
+        while start <= last:
+            watermark = self.watermark
+            for event in store.range(start=start, end=start + chunk):
+                if event['ts'] > watermark:
+                    self.update_event(event)
+                    added += 1
+            start += chunk
+        return added
+
+    def save(self, path: str):
+        with self._lock:
+            cameras = list(self.histograms)
+            histograms = np.stack([self.histograms[c] for c in cameras]) if cameras else np.zeros((0,), np.uint32)
+            watermark = self.watermark
+        tmp_path = f"{path}.tmp.npz"
+        np.savez_compressed(tmp_path, cameras=np.array(cameras, dtype=str), histograms=histograms,
+                            watermark=watermark, max_count=self.max_count)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, class_slots: int, max_count: int = 31, min_samples: int = 20) -> "Baseline":
+        baseline = cls(class_slots, max_count, min_samples)
+        if not os.path.isfile(path):
+            return baseline
+        try:
+            with np.load(path) as data:
+                histograms = data['histograms']
+                if int(data['max_count']) != max_count or (len(histograms) and histograms.shape[2] != class_slots):
+                    log.warning("baseline shape changed, rebuilding", path=path)
+                    return baseline
+                baseline.histograms = {str(camera): histograms[i].copy() for i, camera in enumerate(data['cameras'])}
+                baseline.watermark = float(data['watermark'])
+        except Exception as e:
+            log.error("could not load baseline, rebuilding", path=path, error=e)
+        return baseline
@@ -0,0 +1,295 @@
+import threading
+import time
+import cv2 as cv
+from datetime import datetime
+from typing import Dict, List, Optional
+from detections import records_to_dicts, count_by_class
+from summary_worker import KEEP_LATEST_PER_CAMERA
+from helper import load_json_variable
+from vision_logging import get_logger
+from metrics import span, FRAMES, DROPPED_FRAMES
+
+log = get_logger("camera_supervisor")
+
+
+def parse_source(source):
+    if isinstance(source, str) and source.isdigit():
+        return int(source)
+    return source
+
+
+class CameraStats:
+    def __init__(self, smoothing: float = 0.1):
+        self.smoothing = smoothing
+        self.frames_captured = 0
+        self.frames_processed = 0
+        self.reconnects = 0
+        self.capture_fps = 0.0
+        self.processed_fps = 0.0
+        self.latency = 0.0
+        self.connected = False
+        self.last_error = None
+        self._last_capture = None
+        self._last_processed = None
+        self._lock = threading.Lock()
+
+    def _ewma(self, current: float, sample: float) -> float:
+        return sample if current == 0.0 else current + self.smoothing * (sample - current)
+
+    def record_capture(self, now: float):
+        with self._lock:
+            if self._last_capture is not None and now > self._last_capture:
+                self.capture_fps = self._ewma(self.capture_fps, 1.0 / (now - self._last_capture))
+            self._last_capture = now
+            self.frames_captured += 1
+
+    def record_processed(self, captured_at: float, now: float):
+        with self._lock:
+            if self._last_processed is not None and now > self._last_processed:
+                self.processed_fps = self._ewma(self.processed_fps, 1.0 / (now - self._last_processed))
+            self._last_processed = now
+            self.latency = self._ewma(self.latency, now - captured_at)
+            self.frames_processed += 1
+
+    def as_dict(self) -> Dict:
+        with self._lock:
+            return {
+                'connected': self.connected,
+                'frames_captured': self.frames_captured,
+                'frames_processed': self.frames_processed,
+                'capture_fps': round(self.capture_fps, 2),
+                'processed_fps': round(self.processed_fps, 2),
+                'latency_ms': round(self.latency * 1000, 1),
+                'reconnects': self.reconnects,
+                'last_error': self.last_error
+            }
+
+
+def reconnect_limit() -> Optional[int]:
+    # None retries forever; 0 ends the stream on its first failure, as a plain capture loop would.
+    if not load_json_variable("reconnect"):
+        return 0
+    return load_json_variable("max_reconnects") or None
+
+
+class CameraStream:
+    def __init__(self, name: str, source, backoff: float = 1.0, max_backoff: float = 30.0,
+                 max_reconnects: Optional[int] = None):
+        self.name = name
+        self.source = parse_source(source)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_reconnects = max_reconnects
+        # Set once the capture thread has exited, either stopped or out of reconnect attempts.
+        self.ended = threading.Event()
+        self.stats = CameraStats()
+        self._frame = None
+        self._captured_at = 0.0
+        self._seq = 0
+        self._taken_seq = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f"camera-{self.name}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def take_latest(self) -> Optional[tuple]:
+        # Returns (frame, captured_at, frames overwritten since the previous take).
+        with self._lock:
+            if self._frame is None or self._seq == self._taken_seq:
+                return None
+            skipped = self._seq - self._taken_seq - 1
+            self._taken_seq = self._seq
+            return self._frame, self._captured_at, skipped
+
+    def _open(self):
+        cap = cv.VideoCapture(self.source)
+        # Keep the driver buffer short so the slot always holds a recent frame.
+        cap.set(cv.CAP_PROP_BUFFERSIZE, 1)
+        return cap
+
+    def _run(self):
+        try:
+            self._capture()
+        finally:
+            self.ended.set()
+
+    def _gave_up(self, failures: int) -> bool:
+        if self.max_reconnects is None or failures <= self.max_reconnects:
+            return False
+        self.stats.connected = False
+        log.warning("camera stream ended", camera=self.name, reason=self.stats.last_error, failures=failures)
+        return True
+
+    def _capture(self):
+        delay = self.backoff
+        failures = 0
+        while not self._stop.is_set():
+            cap = self._open()
+            if not cap.isOpened():
+                cap.release()
+                failures += 1
+                self.stats.last_error = f"Could not open source {self.source}"
+                if self._gave_up(failures):
+                    return
+                self._mark_disconnected(self.stats.last_error, delay)
+                self._stop.wait(delay)
+                delay = min(delay * 2, self.max_backoff)
+                continue
+
+            self.stats.connected = True
+            frames = FRAMES.labels(self.name)
+            while not self._stop.is_set():
+                with span("capture"):
+                    ret, frame = cap.read()
+                if not ret:
+                    break
+                frames.inc()
+                now = time.monotonic()
+                with self._lock:
+                    self._frame = frame
+                    self._captured_at = now
+                    self._seq += 1
+                self.stats.record_capture(now)
+                delay = self.backoff
+                failures = 0
+
+            cap.release()
+            if not self._stop.is_set():
+                failures += 1
+                self.stats.last_error = "Stream ended"
+                if self._gave_up(failures):
+                    return
+                self._mark_disconnected("Stream ended", delay)
+                self._stop.wait(delay)
+                delay = min(delay * 2, self.max_backoff)
+
+    def _mark_disconnected(self, reason: str, delay: float):
+        self.stats.connected = False
+        self.stats.last_error = reason
+        self.stats.reconnects += 1
+        log.warning("camera disconnected", camera=self.name, reason=reason, retry_in=round(delay, 1))
+
+
+class CameraSupervisor:
+    def __init__(self, vision_system, cameras: List[Dict] = None, max_batch: int = None,
+                 backoff: float = None, max_backoff: float = None):
+        self.vision = vision_system
+        cameras = cameras if cameras is not None else load_json_variable("cameras")
+        self.max_batch = max_batch or load_json_variable("detection_batch_size")
+        backoff = backoff or load_json_variable("reconnect_backoff")
+        max_backoff = max_backoff or load_json_variable("reconnect_backoff_max")
+
+        self.streams = [
+            CameraStream(str(camera.get('name', camera['source'])), camera['source'], backoff, max_backoff,
+                         reconnect_limit())
+            for camera in cameras
+        ]
+        self._next = 0
+        self._stop = threading.Event()
+
+        # One pending summary slot per camera, so a busy camera cannot starve the others.
+        worker = self.vision.summary_worker
+        if worker and worker.queue.drop_policy == KEEP_LATEST_PER_CAMERA:
+            worker.queue.maxsize = max(worker.queue.maxsize, len(self.streams))
+
+    def stats(self) -> Dict[str, Dict]:
+        return {stream.name: stream.stats.as_dict() for stream in self.streams}
+
+    def stop(self):
+        self._stop.set()
+
+    def collect_batch(self) -> List[tuple]:
+        batch = []
+        count = len(self.streams)
+        # Rotate the starting camera so every source gets the first batch slot in turn.
+        for i in range(count):
+            stream = self.streams[(self._next + i) % count]
+            latest = stream.take_latest()
+            if latest is not None:
+                if latest[2]:
+                    DROPPED_FRAMES.labels("stale_frame").inc(latest[2])
+                batch.append((stream, latest[0], latest[1]))
+                if len(batch) >= self.max_batch:
+                    break
+        self._next = (self._next + 1) % max(count, 1)
+        return batch
+
+    def process_batch(self, batch: List[tuple]):
+        # Still cameras keep their previous result and stay out of the YOLO batch.
+        moving = [item for item in batch if self.vision.frame_has_motion(item[1], item[0].name)]
+        batch_records = self.vision.detect_batch([frame for _, frame, _ in moving])
+        records_by_stream = {stream.name: records for (stream, _, _), records in zip(moving, batch_records)}
+        timestamp = datetime.now().isoformat()
+
+        for stream, frame, captured_at in batch:
+            records = records_by_stream.get(stream.name)
+            if records is None:
+                detections = self.vision.last_detections.get(stream.name, [])
+                self.vision.sample_baseline(detections, stream.name)
+            else:
+                with span("detection_dicts"):
+                    detections = records_to_dicts(records, self.vision.MODEL.names, timestamp)
+                    object_counts = count_by_class(detections)
+                self.vision.last_detections[stream.name] = detections
+                self.vision.dispatch_frame(frame, detections, object_counts, camera=stream.name)
+            stream.stats.record_processed(captured_at, time.monotonic())
+
+            if self.vision.stream:
+                self.vision.draw_detections(frame, detections)
+                cv.imshow(f"VisionSense - {stream.name}", frame)
+
+    def run(self):
+        for stream in self.streams:
+            stream.start()
+
+        try:
+            while not self._stop.is_set():
+                batch = self.collect_batch()
+                if not batch:
+                    if all(stream.ended.is_set() for stream in self.streams):
+                        break
+                    self._stop.wait(0.005)
+                    continue
+                try:
+                    self.process_batch(batch)
+                except Exception as e:
+                    log.error("error in camera supervisor", error=e)
+
+                if self.vision.stream and cv.waitKey(1) & 0xFF == ord('q'):
+                    break
+        finally:
+            for stream in self.streams:
+                stream.stop()
+            if self.vision.stream:
+                cv.destroyAllWindows()
+            self.vision.flush()
+
+
+if __name__ == "__main__":
+    from vision import Vision
+    from summary import Summary
+    from model_registry import MODELS, acquire_llava
+
+    llava_key, llava_model = acquire_llava(load_json_variable("model_path"))
+    vision_system = Vision(model_name=load_json_variable("model"),
+                           confidence_threshold=load_json_variable("confidence_threshold"),
+                           stream=load_json_variable("stream"),
+                           summary_model=Summary(llava_model))
+    supervisor = CameraSupervisor(vision_system)
+    try:
+        supervisor.run()
+    except KeyboardInterrupt:
+        pass
+    for name, camera_stats in supervisor.stats().items():
+        print(name, camera_stats)
+    vision_system.close()
+    MODELS.release(llava_key)
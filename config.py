@@ -0,0 +1,249 @@
+import copy
+import json
+import os
+import threading
+import weakref
+from typing import Any, Callable, Dict, Iterable, Optional
+
+CONFIG_PATH = "config.json"
+
+REQUIRED = object()
+
+# The alert rules config.json ships with; they reproduce the fixed night/day/vehicle thresholds.
+DEFAULT_ALERT_RULES = [
+    {"name": "night_person_count", "alert_type": "night_intrusion", "severity": "high", "classes": ["person"],
+     "hours": "night", "threshold": "person_threshold",
+     "message": "Night time: {count} persons detected (threshold: {threshold})"},
+    {"name": "day_person_count", "alert_type": "crowd_detection", "severity": "medium", "classes": ["person"],
+     "hours": "day", "threshold": 7, "message": "Day time: {count} persons detected (threshold: {threshold})"},
+    {"name": "vehicle_count", "alert_type": "traffic", "severity": "medium",
+     "classes": ["car", "truck", "bus", "motorcycle", "bicycle"], "threshold": 5,
+     "message": "{count} vehicles detected (threshold: {threshold})"}
+]
+
+# key -> (accepted types, allowed values or None, default). Keys added after the original config.json have a
+# default, so an older config file keeps loading; only the original keys are REQUIRED.
+CONFIG_SCHEMA = {
+    "model": (str, None, REQUIRED),
+    "confidence_threshold": ((int, float), None, REQUIRED),
+    "stream": (bool, None, REQUIRED),
+    "max_token": (int, None, REQUIRED),
+    "temperature": ((int, float), None, REQUIRED),
+    "model_path": (str, None, REQUIRED),
+    "memory_size": (int, None, REQUIRED),
+    "summary_image_mode": (str, ("full", "mosaic"), "mosaic"),
+    "mosaic_size": (int, None, 336),
+    "mosaic_max_crops": (int, None, 8),
+    "night_start": (int, None, REQUIRED),
+    "night_end": (int, None, REQUIRED),
+    "person_threshold": (int, None, REQUIRED),
+    "alert_rules": (list, None, DEFAULT_ALERT_RULES),
+    "alert_aggregation": (bool, None, True),
+    "alert_min_duration": ((int, float), None, 2),
+    "alert_clear_after": ((int, float), None, 10),
+    "alert_clear_margin": ((int, float), None, 1),
+    "alert_cooldown": ((int, float), None, 60),
+    "csv_filename": (str, None, REQUIRED),
+    "async_summary": (bool, None, True),
+    "summary_queue_size": (int, None, 4),
+    "summary_drop_policy": (str, ("drop_oldest", "keep_latest_per_camera", "block"), "keep_latest_per_camera"),
+    "summary_batch_size": (int, None, 4),
+    "summary_batch_wait": ((int, float), None, 0.05),
+    "summary_prefix_cache": (bool, None, True),
+    "summary_streaming": (bool, None, True),
+    "summary_early_stop": (bool, None, True),
+    "summary_cache": (bool, None, True),
+    "summary_cache_size": (int, None, 256),
+    "summary_cache_ttl": ((int, float), None, 300),
+    "summary_cache_distance": (int, None, 6),
+    "summary_cache_grid": (int, None, 8),
+    "summary_cache_path": (str, None, ""),
+    "summary_while_loading": (str, ("queue", "skip"), "queue"),
+    "scene_gate": (bool, None, True),
+    "gate_count_delta": (int, None, 1),
+    "gate_min_iou": ((int, float), None, 0.5),
+    "gate_max_displacement": ((int, float), None, 0.25),
+    "gate_max_staleness": ((int, float), None, 60),
+    "cameras": (list, None, [{"name": "camera_0", "source": 0}]),
+    "detection_batch_size": (int, None, 8),
+    "reconnect_backoff": ((int, float), None, 1),
+    "reconnect_backoff_max": ((int, float), None, 30),
+    "reconnect": (bool, None, True),
+    "max_reconnects": (int, None, 5),
+    "event_store": (str, ("sqlite", "parquet", "csv"), "sqlite"),
+    "event_db": (str, None, "events.db"),
+    "event_parquet_dir": (str, None, "events"),
+    "event_batch_size": (int, None, 32),
+    "event_flush_interval": ((int, float), None, 1.0),
+    "feed_capacity": (int, None, 500),
+    "baseline": (bool, None, True),
+    "baseline_path": (str, None, "baseline.npz"),
+    "baseline_max_count": (int, None, 31),
+    "baseline_min_samples": (int, None, 20),
+    "baseline_sample_interval": ((int, float), None, 5.0),
+    "config_reload_interval": ((int, float), None, 2.0),
+    "log_level": (str, ("DEBUG", "INFO", "WARNING", "ERROR"), "INFO"),
+    "log_format": (str, ("text", "json"), "text"),
+    "log_rate_limit": ((int, float), None, 5),
+    "log_sample_rate": ((int, float), None, 1.0),
+    "metrics_port": (int, None, 9108),
+    "rate_control": (bool, None, True),
+    "min_detection_interval": ((int, float), None, 0.0),
+    "max_detection_interval": ((int, float), None, 1.0),
+    "idle_backoff": ((int, float), None, 1.5),
+    "motion_filter": (bool, None, True),
+    "motion_method": (str, ("diff", "mog2"), "diff"),
+    "motion_width": (int, None, 160),
+    "motion_threshold": ((int, float), None, 25),
+    "motion_min_area": ((int, float), None, 0.002),
+    "motion_refresh": ((int, float), None, 10),
+    "motion_rois": (dict, None, {}),
+    "zones": (dict, None, {}),
+    "zone_cell_size": (int, None, 4),
+    "tracking": (bool, None, True),
+    "summary_trigger": (str, ("scene", "track_events"), "scene"),
+    "track_iou_threshold": ((int, float), None, 0.3),
+    "track_min_hits": (int, None, 3),
+    "track_lost_after": ((int, float), None, 2.0),
+    "loiter_seconds": ((int, float), None, 30),
+}
+
+
+class ConfigError(ValueError):
+    pass
+
+
+def validate_config(values: Dict[str, Any]) -> Dict[str, Any]:
+    errors = []
+    values = dict(values)
+    for key, (types, choices, default) in CONFIG_SCHEMA.items():
+        if key not in values:
+            if default is REQUIRED:
+                errors.append(f"missing '{key}'")
+            else:
+                values[key] = copy.deepcopy(default)
+            continue
+        value = values[key]
+        # bool is a subclass of int, so it has to be rejected explicitly for numeric keys.
+        if not isinstance(value, types) or (isinstance(value, bool) and types is not bool):
+            expected = " or ".join(t.__name__ for t in (types if isinstance(types, tuple) else (types,)))
+            errors.append(f"'{key}' should be {expected}, got {type(value).__name__}")
+        elif choices is not None and value not in choices:
+            errors.append(f"'{key}' should be one of {choices}, got '{value}'")
+
+    for i, camera in enumerate(values.get("cameras") or []):
+        if not isinstance(camera, dict) or "source" not in camera:
+            errors.append(f"cameras[{i}] needs a 'source'")
+
+    if errors:
+        raise ConfigError("Invalid configuration: " + "; ".join(errors))
+    return values
+
+
+class Config:
+    def __init__(self, path: str = CONFIG_PATH):
+        self.path = path
+        self._values = {}
+        self._mtime = None
+        self._subscribers = []
+        self._lock = threading.RLock()
+        self._watcher = None
+        self._stop = threading.Event()
+        self.reload(force=True)
+
+    def __getitem__(self, key: str) -> Any:
+        return self._values[key]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._values
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._values.get(key, default)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(self._values)
+
+    def reload(self, force: bool = False) -> bool:
+        with self._lock:
+            try:
+                mtime = os.stat(self.path).st_mtime_ns
+            except OSError as e:
+                if force:
+                    raise
+                print(f"Error reading config {self.path}: {e}")
+                return False
+            if not force and mtime == self._mtime:
+                return False
+
+            try:
+                with open(self.path) as f:
+                    values = validate_config(json.load(f))
+            except (ValueError, OSError) as e:
+                if force:
+                    raise
+                # Keep running on the last good configuration.
+                print(f"Ignoring config change: {e}")
+                self._mtime = mtime
+                return False
+
+            changed = {key: value for key, value in values.items() if self._values.get(key) != value}
+            # Swap the whole dict so readers never see a half-applied update.
+            self._values = values
+            self._mtime = mtime
+
+        if changed and not force:
+            self._notify(changed)
+        return bool(changed)
+
+    def subscribe(self, callback: Callable[[Dict[str, Any]], None], keys: Optional[Iterable[str]] = None):
+        # Bound methods are held weakly so subscribers can be garbage collected without unsubscribing.
+        ref = weakref.WeakMethod(callback) if hasattr(callback, "__self__") else (lambda: callback)
+        with self._lock:
+            self._subscribers.append((ref, set(keys) if keys else None))
+
+    def _notify(self, changed: Dict[str, Any]):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        alive = []
+        for ref, keys in subscribers:
+            callback = ref()
+            if callback is None:
+                continue
+            alive.append((ref, keys))
+            relevant = changed if keys is None else {k: v for k, v in changed.items() if k in keys}
+            if relevant:
+                try:
+                    callback(relevant)
+                except Exception as e:
+                    print(f"Error applying config change: {e}")
+        with self._lock:
+            self._subscribers = [s for s in self._subscribers if s in alive or s not in subscribers]
+
+    def start_watching(self, interval: float = None):
+        if self._watcher is not None and self._watcher.is_alive():
+            return self
+        interval = interval or self.get("config_reload_interval", 2.0)
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name="config-watcher", daemon=True)
+        self._watcher.start()
+        return self
+
+    def stop_watching(self):
+        self._stop.set()
+
+    def _watch(self, interval: float):
+        while not self._stop.wait(interval):
+            self.reload()
+
+
+_config = None
+_config_lock = threading.Lock()
+
+
+def get_config() -> Config:
+    global _config
+    if _config is None:
+        with _config_lock:
+            if _config is None:
+                _config = Config().start_watching()
+    return _config
@@ -0,0 +1,59 @@
+import numpy as np
+from datetime import datetime
+from typing import Dict, List
+
+DETECTION_DTYPE = np.dtype([
+    ("class_id", np.int32),
+    ("confidence", np.float32),
+    ("bbox", np.int32, (4,)),
+])
+
+
+def empty_records() -> np.ndarray:
+    return np.empty(0, dtype=DETECTION_DTYPE)
+
+
+def records_from_array(data: np.ndarray, confidence_threshold: float) -> np.ndarray:
+    # data is an (N, 6) or (N, 7) host copy of ultralytics Boxes.data: xyxy[, track_id], conf, cls
+    if data is None or len(data) == 0:
+        return empty_records()
+
+    keep = data[:, -2] >= confidence_threshold
+    kept = data[keep]
+    records = np.empty(len(kept), dtype=DETECTION_DTYPE)
+    records["class_id"] = kept[:, -1]
+    records["confidence"] = kept[:, -2]
+    records["bbox"] = kept[:, :4]
+    return records
+
+
+def records_to_dicts(records: np.ndarray, class_names: Dict[int, str], timestamp: str = None) -> List[Dict]:
+    if len(records) == 0:
+        return []
+
+    timestamp = timestamp or datetime.now().isoformat()
+    bbox = records["bbox"]
+    centers = np.stack([(bbox[:, 0] + bbox[:, 2]) // 2, (bbox[:, 1] + bbox[:, 3]) // 2], axis=1)
+    areas = (bbox[:, 2] - bbox[:, 0]) * (bbox[:, 3] - bbox[:, 1])
+    confidences = np.round(records["confidence"].astype(np.float64), 3)
+
+    detections = []
+    for class_id, confidence, box, center, area in zip(records["class_id"].tolist(), confidences.tolist(),
+                                                       bbox.tolist(), centers.tolist(), areas.tolist()):
+        detections.append({
+            "timestamp": timestamp,
+            "class_id": class_id,
+            "class_name": class_names[class_id],
+            "confidence": confidence,
+            "bbox": box,
+            "center": center,
+            "area": area
+        })
+    return detections
+
+
+def count_by_class(detections: List[Dict]) -> Dict[str, int]:
+    counts = {}
+    for detection in detections:
+        counts[detection["class_name"]] = counts.get(detection["class_name"], 0) + 1
+    return counts
@@ -0,0 +1,46 @@
+import threading
+from collections import deque
+from typing import Dict, List, Optional
+from event_store import BufferedEventStore
+
+
+class EventFeed:
+    def __init__(self, store: BufferedEventStore, capacity: int = 500):
+        self.store = store
+        self.capacity = capacity
+        self.events = deque(maxlen=capacity)
+        self.total = 0
+        self.first_timestamp = None
+        self._cursor = None
+        self._lock = threading.Lock()
+
+    def refresh(self) -> int:
+        with self._lock:
+            if self._cursor is None:
+                # The only full count and bounds lookup; afterwards the feed only reads new rows.
+                self.total = self.store.count()
+                bounds = self.store.time_bounds()
+                self.first_timestamp = bounds[0] if bounds else None
+                new_events, self._cursor, added = self.store.tail(None, self.capacity)
+            else:
+                new_events, self._cursor, added = self.store.tail(self._cursor, self.capacity)
+                self.total += added
+                if self.first_timestamp is None and new_events:
+                    self.first_timestamp = new_events[0]['timestamp']
+
+            self.events.extend(new_events)
+            return added
+
+    def latest(self, n: int = 1, alert_status: Optional[bool] = None) -> List[Dict]:
+        with self._lock:
+            events = []
+            for event in reversed(self.events):
+                if alert_status is None or event['alert_status'] == alert_status:
+                    events.append(event)
+                    if len(events) >= n:
+                        break
+            return events
+
+    def last_timestamp(self) -> Optional[str]:
+        with self._lock:
+            return self.events[-1]['timestamp'] if self.events else None
@@ -0,0 +1,554 @@
+import abc
+import argparse
+import csv
+import glob
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from helper import load_json_variable
+
+CSV_FIELDNAMES = ['timestamp', 'summary', 'detections_json', 'object_counts_json', 'total_objects',
+                  'alert_status', 'alert_severity', 'alert_type', 'alert_message', 'alert_details_json']
+
+
+def to_epoch(value) -> float:
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+
+
+def build_event(summary_text: str, detections: List[Dict], object_counts: Dict, alert_data: Dict = None,
+                camera: str = "default", timestamp: str = None) -> Dict[str, Any]:
+    timestamp = timestamp or datetime.now().isoformat()
+    alert_data = alert_data or {}
+
+    return {
+        'timestamp': timestamp,
+        'ts': to_epoch(timestamp),
+        'camera': camera,
+        'summary': summary_text,
+        'total_objects': len(detections),
+        'object_counts': object_counts,
+        'class_ids': np.array([d['class_id'] for d in detections], dtype=np.int32),
+        'class_names': [d['class_name'] for d in detections],
+        'confidences': np.array([d['confidence'] for d in detections], dtype=np.float32),
+        'bboxes': np.array([d['bbox'] for d in detections], dtype=np.int32).reshape(-1, 4),
+        'alert_status': bool(alert_data.get('should_alert', False)),
+        'alert_severity': alert_data.get('severity', 'none'),
+        'alert_type': alert_data.get('alert_type', 'none'),
+        'alert_message': alert_data.get('message', 'No alerts'),
+        'alert_details': alert_data.get('details', {})
+    }
+
+
+def event_detections(event: Dict) -> List[Dict]:
+    detections = []
+    for class_id, class_name, confidence, bbox in zip(event['class_ids'].tolist(), event['class_names'],
+                                                      event['confidences'].tolist(), event['bboxes'].tolist()):
+        x1, y1, x2, y2 = bbox
+        detections.append({'class_id': class_id, 'class_name': class_name,
+                           'confidence': round(confidence, 3), 'bbox': bbox,
+                           'center': [(x1 + x2) // 2, (y1 + y2) // 2], 'area': (x2 - x1) * (y2 - y1)})
+    return detections
+
+
+class BufferedEventStore(abc.ABC):
+    def __init__(self, batch_size: int = 32, flush_interval: float = 1.0):
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = flush_interval
+        self._pending = []
+        self._lock = threading.RLock()
+        self._last_flush = time.monotonic()
+        self._closed = threading.Event()
+        self._flusher = None
+        if flush_interval:
+            # Makes sure a trickle of events reaches disk even when no batch fills up.
+            self._flusher = threading.Thread(target=self._flush_periodically, name="event-store-flush", daemon=True)
+            self._flusher.start()
+
+    def append(self, event: Dict):
+        with self._lock:
+            self._pending.append(event)
+            if len(self._pending) >= self.batch_size:
+                self.flush()
+
+    def flush(self):
+        with self._lock:
+            if self._pending:
+                self._write_batch(self._pending)
+                self._pending = []
+            self._last_flush = time.monotonic()
+
+    def close(self):
+        self._closed.set()
+        self.flush()
+
+    def latest(self, n: int = 1, alert_status: bool = None) -> List[Dict]:
+        with self._lock:
+            pending = [e for e in reversed(self._pending) if alert_status is None or e['alert_status'] == alert_status]
+            if len(pending) >= n:
+                return pending[:n]
+            return pending + self._read_latest(n - len(pending), alert_status)
+
+    def range(self, start=None, end=None, severity: str = None, alert_type: str = None, camera: str = None,
+              alert_status: bool = None, limit: int = None) -> List[Dict]:
+        self.flush()
+        start = to_epoch(start) if start is not None else None
+        end = to_epoch(end) if end is not None else None
+        return self._read_range(start, end, severity, alert_type, camera, alert_status, limit)
+
+    def count(self) -> int:
+        self.flush()
+        return self._count()
+
+    def time_bounds(self) -> Optional[tuple]:
+        self.flush()
+        return self._time_bounds()
+
+    @abc.abstractmethod
+    def tail(self, cursor=None, limit: int = 500) -> tuple:
+        # Returns (events oldest first, cursor, new rows). A None cursor starts from the last `limit` events.
+        # Only the newest `limit` rows after the cursor are returned, but the count covers every row it moved past.
+        raise NotImplementedError
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self.flush_interval):
+            if time.monotonic() - self._last_flush >= self.flush_interval:
+                try:
+                    self.flush()
+                except Exception as e:
+                    print(f"Error flushing event store: {e}")
+
+    @abc.abstractmethod
+    def _write_batch(self, events: List[Dict]):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def _read_latest(self, n: int, alert_status: Optional[bool]) -> List[Dict]:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def _read_range(self, start, end, severity, alert_type, camera, alert_status, limit) -> List[Dict]:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def _count(self) -> int:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def _time_bounds(self) -> Optional[tuple]:
+        raise NotImplementedError
+
+
+class SQLiteEventStore(BufferedEventStore):
+    COLUMNS = ['ts', 'timestamp', 'camera', 'summary', 'total_objects', 'object_counts', 'class_ids', 'class_names',
+               'confidences', 'bboxes', 'alert_status', 'alert_severity', 'alert_type', 'alert_message', 'alert_details']
+
+    def __init__(self, path: str, batch_size: int = 32, flush_interval: float = 1.0):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                ts REAL NOT NULL,
+                timestamp TEXT NOT NULL,
+                camera TEXT NOT NULL,
+                summary TEXT,
+                total_objects INTEGER NOT NULL,
+                object_counts TEXT NOT NULL,
+                class_ids BLOB,
+                class_names TEXT,
+                confidences BLOB,
+                bboxes BLOB,
+                alert_status INTEGER NOT NULL,
+                alert_severity TEXT NOT NULL,
+                alert_type TEXT NOT NULL,
+                alert_message TEXT,
+                alert_details TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_events_ts ON events (ts);
+            CREATE INDEX IF NOT EXISTS idx_events_severity ON events (alert_severity, ts);
+            CREATE INDEX IF NOT EXISTS idx_events_alert_type ON events (alert_type, ts);
+            CREATE INDEX IF NOT EXISTS idx_events_camera ON events (camera, ts);
+        """)
+        self._conn.commit()
+        super().__init__(batch_size, flush_interval)
+
+    def close(self):
+        super().close()
+        with self._lock:
+            self._conn.close()
+
+    def _write_batch(self, events: List[Dict]):
+        rows = [(
+            e['ts'], e['timestamp'], e['camera'], e['summary'], e['total_objects'], json.dumps(e['object_counts']),
+            e['class_ids'].astype(np.int32).tobytes(), json.dumps(e['class_names']),
+            e['confidences'].astype(np.float32).tobytes(), e['bboxes'].astype(np.int32).tobytes(),
+            int(e['alert_status']), e['alert_severity'], e['alert_type'], e['alert_message'],
+            json.dumps(e['alert_details'])
+        ) for e in events]
+        placeholders = ", ".join("?" * len(self.COLUMNS))
+        with self._conn:
+            self._conn.executemany(f"INSERT INTO events ({', '.join(self.COLUMNS)}) VALUES ({placeholders})", rows)
+
+    def _row_to_event(self, row) -> Dict:
+        (event_id, ts, timestamp, camera, summary, total_objects, object_counts, class_ids, class_names,
+         confidences, bboxes, alert_status, alert_severity, alert_type, alert_message, alert_details) = row
+        return {
+            'id': event_id,
+            'ts': ts,
+            'timestamp': timestamp,
+            'camera': camera,
+            'summary': summary,
+            'total_objects': total_objects,
+            'object_counts': json.loads(object_counts),
+            'class_ids': np.frombuffer(class_ids or b'', dtype=np.int32),
+            'class_names': json.loads(class_names or '[]'),
+            'confidences': np.frombuffer(confidences or b'', dtype=np.float32),
+            'bboxes': np.frombuffer(bboxes or b'', dtype=np.int32).reshape(-1, 4),
+            'alert_status': bool(alert_status),
+            'alert_severity': alert_severity,
+            'alert_type': alert_type,
+            'alert_message': alert_message,
+            'alert_details': json.loads(alert_details or '{}')
+        }
+
+    def _select(self, where: str, params: list, order: str, limit: int = None, after_id: int = None) -> List[Dict]:
+        sql = f"SELECT id, {', '.join(self.COLUMNS)} FROM events"
+        if after_id is not None:
+            where = f"{where} AND id > ?" if where else "id > ?"
+            params = params + [after_id]
+        if where:
+            sql += f" WHERE {where}"
+        sql += f" ORDER BY {order}"
+        if limit:
+            sql += " LIMIT ?"
+            params = params + [limit]
+        with self._lock:
+            return [self._row_to_event(row) for row in self._conn.execute(sql, params)]
+
+    def _read_latest(self, n: int, alert_status: Optional[bool]) -> List[Dict]:
+        if alert_status is None:
+            return self._select("", [], "id DESC", n)
+        return self._select("alert_status = ?", [int(alert_status)], "id DESC", n)
+
+    def tail(self, cursor: int = None, limit: int = 500) -> tuple:
+        # Newest rows first, so a reader that fell behind jumps to the present instead of replaying the backlog.
+        events = self._select("", [], "id DESC", limit, after_id=cursor)
+        events.reverse()
+        added = len(events)
+        if events and cursor is not None and len(events) == limit:
+            with self._lock:
+                added = self._conn.execute("SELECT COUNT(*) FROM events WHERE id > ?", (cursor,)).fetchone()[0]
+        if events:
+            cursor = events[-1]['id']
+        return events, cursor or 0, added
+
+    def _read_range(self, start, end, severity, alert_type, camera, alert_status, limit) -> List[Dict]:
+        clauses, params = [], []
+        for clause, value in (("ts >= ?", start), ("ts <= ?", end), ("alert_severity = ?", severity),
+                              ("alert_type = ?", alert_type), ("camera = ?", camera),
+                              ("alert_status = ?", None if alert_status is None else int(alert_status))):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        return self._select(" AND ".join(clauses), params, "ts DESC", limit)
+
+    def _count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+
+    def _time_bounds(self) -> Optional[tuple]:
+        with self._lock:
+            first = self._conn.execute("SELECT timestamp FROM events ORDER BY ts ASC LIMIT 1").fetchone()
+            last = self._conn.execute("SELECT timestamp FROM events ORDER BY ts DESC LIMIT 1").fetchone()
+        return (first[0], last[0]) if first else None
+
+
+class ParquetEventStore(BufferedEventStore):
+    def __init__(self, directory: str, batch_size: int = 1000, flush_interval: float = 60.0):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("The parquet event store requires pyarrow (pip install pyarrow)") from e
+
+        self._pa = pa
+        self._pq = pq
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._schema = pa.schema([
+            ('ts', pa.float64()),
+            ('timestamp', pa.string()),
+            ('camera', pa.string()),
+            ('summary', pa.string()),
+            ('total_objects', pa.int32()),
+            ('object_counts', pa.string()),
+            ('class_ids', pa.list_(pa.int32())),
+            ('class_names', pa.list_(pa.string())),
+            ('confidences', pa.list_(pa.float32())),
+            ('bboxes', pa.list_(pa.int32())),
+            ('alert_status', pa.bool_()),
+            ('alert_severity', pa.string()),
+            ('alert_type', pa.string()),
+            ('alert_message', pa.string()),
+            ('alert_details', pa.string()),
+        ])
+        super().__init__(batch_size, flush_interval)
+
+    def _segments(self) -> List[str]:
+        # Segment names start with the zero-padded first timestamp, so lexical order is time order.
+        return sorted(glob.glob(os.path.join(self.directory, "events-*.parquet")))
+
+    @staticmethod
+    def _segment_bounds(path: str) -> tuple:
+        # A name collision adds a "_<n>" suffix after the last timestamp.
+        _, first, last = os.path.basename(path)[:-len(".parquet")].split("-", 2)
+        return int(first) / 1000.0, int(last.split("_")[0]) / 1000.0
+
+    def _write_batch(self, events: List[Dict]):
+        events = sorted(events, key=lambda e: e['ts'])
+        columns = {
+            'ts': [e['ts'] for e in events],
+            'timestamp': [e['timestamp'] for e in events],
+            'camera': [e['camera'] for e in events],
+            'summary': [e['summary'] for e in events],
+            'total_objects': [e['total_objects'] for e in events],
+            'object_counts': [json.dumps(e['object_counts']) for e in events],
+            'class_ids': [e['class_ids'].tolist() for e in events],
+            'class_names': [e['class_names'] for e in events],
+            'confidences': [e['confidences'].tolist() for e in events],
+            'bboxes': [e['bboxes'].reshape(-1).tolist() for e in events],
+            'alert_status': [e['alert_status'] for e in events],
+            'alert_severity': [e['alert_severity'] for e in events],
+            'alert_type': [e['alert_type'] for e in events],
+            'alert_message': [e['alert_message'] for e in events],
+            'alert_details': [json.dumps(e['alert_details']) for e in events],
+        }
+        table = self._pa.table(columns, schema=self._schema)
+        first, last = int(events[0]['ts'] * 1000), int(events[-1]['ts'] * 1000)
+        path = os.path.join(self.directory, f"events-{first:015d}-{last:015d}.parquet")
+        if os.path.exists(path):
+            path = path.replace(".parquet", f"_{time.monotonic_ns()}.parquet")
+        self._pq.write_table(table, path)
+
+    def _table_to_events(self, table) -> List[Dict]:
+        events = []
+        for row in table.to_pylist():
+            row['object_counts'] = json.loads(row['object_counts'])
+            row['class_ids'] = np.array(row['class_ids'], dtype=np.int32)
+            row['confidences'] = np.array(row['confidences'], dtype=np.float32)
+            row['bboxes'] = np.array(row['bboxes'], dtype=np.int32).reshape(-1, 4)
+            row['alert_details'] = json.loads(row['alert_details'])
+            events.append(row)
+        return events
+
+    def _read_latest(self, n: int, alert_status: Optional[bool]) -> List[Dict]:
+        events = []
+        for path in reversed(self._segments()):
+            table = self._pq.read_table(path)
+            segment = self._table_to_events(table)
+            segment.reverse()
+            events.extend(e for e in segment if alert_status is None or e['alert_status'] == alert_status)
+            if len(events) >= n:
+                break
+        return events[:n]
+
+    def _read_range(self, start, end, severity, alert_type, camera, alert_status, limit) -> List[Dict]:
+        filters = []
+        for column, op, value in (('ts', '>=', start), ('ts', '<=', end), ('alert_severity', '==', severity),
+                                  ('alert_type', '==', alert_type), ('camera', '==', camera),
+                                  ('alert_status', '==', alert_status)):
+            if value is not None:
+                filters.append((column, op, value))
+
+        events = []
+        for path in reversed(self._segments()):
+            first, last = self._segment_bounds(path)
+            if (start is not None and last < start) or (end is not None and first > end):
+                continue
+            table = self._pq.read_table(path, filters=filters or None)
+            segment = self._table_to_events(table)
+            segment.reverse()
+            events.extend(segment)
+            if limit and len(events) >= limit:
+                break
+        events.sort(key=lambda e: e['ts'], reverse=True)
+        return events[:limit] if limit else events
+
+    def tail(self, cursor: str = None, limit: int = 500) -> tuple:
+        segments = self._segments()
+        new_segments = segments[-1:] if cursor is None else [path for path in segments if path > cursor]
+        events = []
+        for path in new_segments:
+            events.extend(self._table_to_events(self._pq.read_table(path)))
+        if new_segments:
+            cursor = new_segments[-1]
+        return events[-limit:], cursor or "", len(events)
+
+    def _count(self) -> int:
+        return sum(self._pq.ParquetFile(path).metadata.num_rows for path in self._segments())
+
+    def _time_bounds(self) -> Optional[tuple]:
+        segments = self._segments()
+        if not segments:
+            return None
+        first = self._pq.read_table(segments[0], columns=['timestamp'])['timestamp'][0].as_py()
+        last = self._pq.read_table(segments[-1], columns=['timestamp'])['timestamp'][-1].as_py()
+        return first, last
+
+
+class CsvEventStore(BufferedEventStore):
+    def __init__(self, path: str, batch_size: int = 1, flush_interval: float = 1.0):
+        self.path = path
+        super().__init__(batch_size, flush_interval)
+
+    def _write_batch(self, events: List[Dict]):
+        file_exists = os.path.isfile(self.path)
+        with open(self.path, 'a', newline='', encoding='utf-8') as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=CSV_FIELDNAMES)
+            if not file_exists:
+                writer.writeheader()
+                print(f"Created new CSV file: {self.path}")
+            for e in events:
+                writer.writerow({
+                    'timestamp': e['timestamp'],
+                    'summary': e['summary'],
+                    'detections_json': json.dumps(event_detections(e)),
+                    'object_counts_json': json.dumps(e['object_counts']),
+                    'total_objects': e['total_objects'],
+                    'alert_status': 'true' if e['alert_status'] else 'false',
+                    'alert_severity': e['alert_severity'],
+                    'alert_type': e['alert_type'],
+                    'alert_message': e['alert_message'],
+                    'alert_details_json': json.dumps(e['alert_details'])
+                })
+
+    def _read_all(self) -> List[Dict]:
+        if not os.path.isfile(self.path):
+            return []
+        with open(self.path, newline='', encoding='utf-8') as csvfile:
+            return [event_from_csv_row(row) for row in csv.DictReader(csvfile)]
+
+    def _read_latest(self, n: int, alert_status: Optional[bool]) -> List[Dict]:
+        events = [e for e in reversed(self._read_all()) if alert_status is None or e['alert_status'] == alert_status]
+        return events[:n]
+
+    def _read_range(self, start, end, severity, alert_type, camera, alert_status, limit) -> List[Dict]:
+        events = []
+        for e in reversed(self._read_all()):
+            if (start is not None and e['ts'] < start) or (end is not None and e['ts'] > end):
+                continue
+            if (severity and e['alert_severity'] != severity) or (alert_type and e['alert_type'] != alert_type):
+                continue
+            if (camera and e['camera'] != camera) or (alert_status is not None and e['alert_status'] != alert_status):
+                continue
+            events.append(e)
+        events.sort(key=lambda e: e['ts'], reverse=True)
+        return events[:limit] if limit else events
+
+    def tail(self, cursor: int = None, limit: int = 500) -> tuple:
+        if not os.path.isfile(self.path):
+            return [], 0, 0
+
+        events = deque(maxlen=limit)
+        added = 0
+        with open(self.path, 'rb') as csvfile:
+            header = csvfile.readline()
+            fieldnames = next(csv.reader([header.decode('utf-8')]))
+            if cursor:
+                csvfile.seek(cursor)
+            cursor = csvfile.tell()
+
+            record = b''
+            for line in csvfile:
+                if not line.endswith(b'\n'):
+                    break  # Partially written row; pick it up on the next call.
+                record += line
+                # Quotes are escaped by doubling, so an odd count means a quoted field spans lines.
+                if record.count(b'"') % 2:
+                    continue
+                values = next(csv.reader(io.StringIO(record.decode('utf-8'))))
+                events.append(event_from_csv_row(dict(zip(fieldnames, values))))
+                added += 1
+                cursor += len(record)
+                record = b''
+        return list(events), cursor, added
+
+    def _count(self) -> int:
+        return len(self._read_all())
+
+    def _time_bounds(self) -> Optional[tuple]:
+        events = self._read_all()
+        if not events:
+            return None
+        timestamps = sorted(e['timestamp'] for e in events)
+        return timestamps[0], timestamps[-1]
+
+
+def event_from_csv_row(row: Dict[str, str]) -> Dict[str, Any]:
+    detections = json.loads(row.get('detections_json') or '[]')
+    alert_data = {
+        'should_alert': row.get('alert_status', 'false') == 'true',
+        'severity': row.get('alert_severity') or 'none',
+        'alert_type': row.get('alert_type') or 'none',
+        'message': row.get('alert_message') or 'No alerts',
+        'details': json.loads(row.get('alert_details_json') or '{}')
+    }
+    return build_event(row.get('summary', ''), detections, json.loads(row.get('object_counts_json') or '{}'),
+                       alert_data, row.get('camera') or 'default', row['timestamp'])
+
+
+def create_event_store(backend: str = None) -> BufferedEventStore:
+    backend = backend or load_json_variable("event_store")
+    batch_size = load_json_variable("event_batch_size")
+    flush_interval = load_json_variable("event_flush_interval")
+
+    if backend == "sqlite":
+        return SQLiteEventStore(load_json_variable("event_db"), batch_size, flush_interval)
+    if backend == "parquet":
+        return ParquetEventStore(load_json_variable("event_parquet_dir"), batch_size, flush_interval)
+    if backend == "csv":
+        return CsvEventStore(load_json_variable("csv_filename"), batch_size, flush_interval)
+    raise ValueError(f"Unknown event store backend '{backend}'")
+
+
+def migrate_csv(csv_path: str, store: BufferedEventStore) -> int:
+    imported = 0
+    with open(csv_path, newline='', encoding='utf-8') as csvfile:
+        for row in csv.DictReader(csvfile):
+            try:
+                store.append(event_from_csv_row(row))
+                imported += 1
+            except (ValueError, KeyError) as e:
+                print(f"Skipping malformed row {row.get('timestamp')}: {e}")
+    store.flush()
+    return imported
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="VisionSense event store tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    migrate = subparsers.add_parser("migrate", help="Import an existing CSV log into the event store")
+    migrate.add_argument("--csv", default=None, help="CSV log to import (defaults to csv_filename from config.json)")
+    migrate.add_argument("--backend", default=None, choices=["sqlite", "parquet"],
+                         help="Target backend (defaults to event_store from config.json)")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        csv_path = args.csv or load_json_variable("csv_filename")
+        store = create_event_store(args.backend)
+        count = migrate_csv(csv_path, store)
+        store.close()
+        print(f"Imported {count} events from {csv_path}")
@@ -1,7 +1,6 @@
 import torch
 import cv2 as cv
-import os
-import json
+from config import get_config
 
 
 def device():
@@ -9,8 +8,7 @@ def device():
 
 
 def load_json():
-    with open("config.json") as f:
-        config = json.load(f)
+    config = get_config()
 
     model_name = config["model"]
     confidence_threshold = config["confidence_threshold"]
@@ -20,8 +18,5 @@ def load_json():
 
 
 def load_json_variable(variable):
-    with open("config.json") as f:
-        config = json.load(f)
-
-    return config[variable]
+    return get_config()[variable]
 
@@ -0,0 +1,294 @@
+import abc
+import bisect
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+from vision_logging import get_logger
+
+log = get_logger("metrics")
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value))
+
+
+class Metric(abc.ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        key = tuple(str(v) for v in values)
+        series = self._series.get(key)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(key, self._new_series())
+        return series
+
+    def series(self) -> Dict[tuple, object]:
+        with self._lock:
+            return dict(self._series)
+
+    @abc.abstractmethod
+    def _new_series(self):
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        for values, series in sorted(self.series().items()):
+            lines.extend(self._render_series(values, series))
+        return lines
+
+    def _render_series(self, values: tuple, series) -> List[str]:
+        return [f"{self.name}{_format_labels(self.label_names, values)} {_format_value(series.get())}"]
+
+
+class _Value:
+    def __init__(self):
+        self.value = 0.0
+        self.function = None
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def set(self, value: float):
+        self.value = value
+
+    def set_function(self, function: Callable[[], float]):
+        self.function = function
+
+    def get(self) -> float:
+        if self.function is not None:
+            try:
+                return float(self.function())
+            except Exception:
+                return math.nan
+        return self.value
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def _new_series(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def _new_series(self):
+        return _Value()
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def set_function(self, function: Callable[[], float]):
+        self.labels().set_function(function)
+
+
+class _HistogramSeries:
+    def __init__(self, buckets: Tuple[float, ...], reservoir_size: int):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        # Recent observations only, so quantiles follow the current load rather than all-time history.
+        self.recent = deque(maxlen=reservoir_size)
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+            self.recent.append(value)
+
+    def quantiles(self, quantiles: Tuple[float, ...] = QUANTILES) -> Dict[float, float]:
+        with self._lock:
+            samples = sorted(self.recent)
+        if not samples:
+            return {q: math.nan for q in quantiles}
+        return {q: samples[min(len(samples) - 1, int(q * len(samples)))] for q in quantiles}
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS, reservoir_size: int = 1024):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets))
+        self.reservoir_size = reservoir_size
+
+    def _new_series(self):
+        return _HistogramSeries(self.buckets, self.reservoir_size)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def _render_series(self, values: tuple, series: _HistogramSeries) -> List[str]:
+        lines = []
+        with series._lock:
+            counts = list(series.counts)
+            total, count = series.sum, series.count
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+            cumulative += bucket_count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.label_names, values, le)} {cumulative}")
+        labels = _format_labels(self.label_names, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        # p50/p95/p99 over the recent reservoir, as a separate gauge family next to the histogram.
+        name = f"{self.name}_recent"
+        lines.extend([f"# HELP {name} {self.help_text} (quantiles over recent observations)", f"# TYPE {name} gauge"])
+        for values, series in sorted(self.series().items()):
+            for q, value in series.quantiles().items():
+                quantile = f'quantile="{q}"'
+                lines.append(f"{name}{_format_labels(self.label_names, values, quantile)} {_format_value(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, help_text: str, label_names: Tuple[str, ...], **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, label_names, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} already registered as {metric.kind}")
+            return metric
+
+    def counter(self, name: str, help_text: str, label_names: Tuple[str, ...] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help_text, label_names)
+
+    def gauge(self, name: str, help_text: str, label_names: Tuple[str, ...] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, help_text, label_names)
+
+    def histogram(self, name: str, help_text: str, label_names: Tuple[str, ...] = (), **kwargs) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, label_names, **kwargs)
+
+    def metrics(self) -> List[Metric]:
+        with self._lock:
+            return list(self._metrics.values())
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram("visionsense_stage_seconds", "Time spent in each pipeline stage", ("stage",))
+FRAMES = REGISTRY.counter("visionsense_frames_total", "Frames read from capture sources", ("camera",))
+DETECTIONS = REGISTRY.counter("visionsense_detections_total", "Detections above the confidence threshold", ("camera",))
+LLM_CALLS = REGISTRY.counter("visionsense_llm_calls_total", "LLaVA summary generations")
+SUMMARY_BATCH_SIZE = REGISTRY.histogram("visionsense_summary_batch_size", "Summaries generated per model.generate call",
+                                        buckets=(1, 2, 4, 8, 16, 32))
+SUMMARY_CACHE = REGISTRY.counter("visionsense_summary_cache_total", "Summary cache lookups", ("result",))
+DROPPED_FRAMES = REGISTRY.counter("visionsense_dropped_frames_total", "Frames not summarized or not processed", ("reason",))
+QUEUE_DEPTH = REGISTRY.gauge("visionsense_summary_queue_depth", "Jobs waiting for the summary worker")
+MEMORY_BYTES = REGISTRY.gauge("visionsense_memory_bytes", "Resident process memory and allocated GPU memory", ("device",))
+
+
+@contextmanager
+def span(stage: str):
+    series = STAGE_SECONDS.labels(stage)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        series.observe(time.perf_counter() - start)
+
+
+def _resident_memory() -> float:
+    with open(f"/proc/{os.getpid()}/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def _gpu_memory() -> float:
+    import torch
+    return torch.cuda.memory_allocated() if torch.cuda.is_available() else 0.0
+
+
+MEMORY_BYTES.labels("cpu").set_function(_resident_memory)
+MEMORY_BYTES.labels("gpu").set_function(_gpu_memory)
+
+
+def stage_quantiles() -> Dict[str, Dict[float, float]]:
+    return {values[0]: series.quantiles() for values, series in STAGE_SECONDS.series().items()}
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1") -> Optional[ThreadingHTTPServer]:
+    global _server
+    with _server_lock:
+        if _server is not None or not port:
+            return _server
+        try:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        except OSError as e:
+            # Another VisionSense process in this host already serves the port.
+            log.warning("metrics endpoint not started", host=host, port=port, error=e)
+            return None
+        threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        return _server
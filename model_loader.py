@@ -0,0 +1,102 @@
+import threading
+import time
+import torch
+from typing import Callable, Dict, Optional
+from llava.utils import disable_torch_init
+from transformers import LlavaNextProcessor, LlavaNextForConditionalGeneration, BitsAndBytesConfig
+from vision_logging import get_logger
+
+log = get_logger("model_loader")
+
+LLAVA_MODEL_PATH = "llava-hf/llava-v1.6-mistral-7b-hf"
+
+IDLE = "idle"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+def load_llava_model(model_path: str = LLAVA_MODEL_PATH, quantization: str = "nf4",
+                     device_map: str = "auto") -> Optional[Dict]:
+    disable_torch_init()
+    try:
+        quantization_config = None
+        if quantization == "nf4":
+            quantization_config = BitsAndBytesConfig(
+                load_in_4bit=True,
+                bnb_4bit_compute_dtype=torch.float16,
+                bnb_4bit_use_double_quant=True,
+                bnb_4bit_quant_type="nf4"
+            )
+
+        processor = LlavaNextProcessor.from_pretrained(model_path)
+        model = LlavaNextForConditionalGeneration.from_pretrained(
+            model_path,
+            dtype=torch.float16,
+            low_cpu_mem_usage=True,
+            device_map=device_map,
+            quantization_config=quantization_config
+        )
+
+        if hasattr(torch, 'compile'):
+            model = torch.compile(model, mode="reduce-overhead")
+
+        return {
+            'tokenizer': processor.tokenizer,
+            'model': model,
+            'image_processor': processor.image_processor,
+            'context_len': 4096,
+            'processor': processor
+        }
+    except Exception as e:
+        log.error("could not load LLaVA model", model_path=model_path, error=e)
+        return None
+
+
+class BackgroundModel:
+    # Runs a slow loader on its own thread so detection can start while the model is still loading.
+    def __init__(self, loader: Callable[[], Optional[Dict]] = load_llava_model, name: str = "llava"):
+        self.loader = loader
+        self.name = name
+        self.state = IDLE
+        self.components = None
+        self.error = None
+        self.load_seconds = None
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self) -> "BackgroundModel":
+        with self._lock:
+            if self.state == IDLE:
+                self.state = LOADING
+                self._thread = threading.Thread(target=self._load, name=f"{self.name}-loader", daemon=True)
+                self._thread.start()
+        return self
+
+    def _load(self):
+        started = time.monotonic()
+        log.info("loading model", model=self.name)
+        try:
+            components = self.loader()
+        except Exception as e:
+            components = None
+            self.error = e
+        self.load_seconds = round(time.monotonic() - started, 2)
+        with self._lock:
+            self.components = components
+            self.state = READY if components else FAILED
+        if components:
+            log.info("model ready", model=self.name, seconds=self.load_seconds)
+        else:
+            log.error("model failed to load", model=self.name, seconds=self.load_seconds, error=self.error)
+        self._done.set()
+
+    def ready(self) -> bool:
+        return self.state == READY
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        # True once the model is usable; False on timeout or when loading failed.
+        self.start()
+        self._done.wait(timeout)
+        return self.ready()
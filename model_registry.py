@@ -0,0 +1,63 @@
+import threading
+from typing import Callable, Dict, Tuple
+from ultralytics import YOLO
+from model_loader import BackgroundModel, LLAVA_MODEL_PATH, load_llava_model
+from vision_logging import get_logger
+
+log = get_logger("model_registry")
+
+
+def model_key(kind: str, path: str, quantization: str = None, device: str = None) -> Tuple[str, str, str, str]:
+    return kind, str(path), quantization or "none", str(device or "auto")
+
+
+class ModelRegistry:
+    # One loaded instance per (kind, path, quantization, device) for the whole process, shared by every entry point.
+    # Each acquire needs a matching release; the last release drops the model so its memory can be reclaimed.
+    def __init__(self):
+        self.models: Dict[tuple, object] = {}
+        self.refs: Dict[tuple, int] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key: tuple, loader: Callable[[], object]):
+        with self._lock:
+            if key not in self.models:
+                log.info("loading model", key=key)
+                self.models[key] = loader()
+                self.refs[key] = 0
+            self.refs[key] += 1
+            return self.models[key]
+
+    def release(self, key: tuple):
+        with self._lock:
+            if key not in self.refs:
+                return
+            self.refs[key] -= 1
+            if self.refs[key] <= 0:
+                del self.refs[key]
+                del self.models[key]
+                log.info("model released", key=key)
+
+    def refcount(self, key: tuple) -> int:
+        with self._lock:
+            return self.refs.get(key, 0)
+
+    def loaded(self) -> Dict[tuple, int]:
+        with self._lock:
+            return dict(self.refs)
+
+
+MODELS = ModelRegistry()
+
+
+def acquire_yolo(path: str) -> Tuple[tuple, YOLO]:
+    key = model_key("yolo", path)
+    return key, MODELS.acquire(key, lambda: YOLO(path, verbose=False))
+
+
+def acquire_llava(path: str = LLAVA_MODEL_PATH, quantization: str = "nf4",
+                  device: str = "auto") -> Tuple[tuple, BackgroundModel]:
+    # The registry holds the BackgroundModel, so a second caller shares the load already in progress.
+    key = model_key("llava", path, quantization, device)
+    return key, MODELS.acquire(key, lambda: BackgroundModel(
+        lambda: load_llava_model(path, quantization=quantization, device_map=device)).start())
@@ -0,0 +1,57 @@
+import math
+import cv2 as cv
+import numpy as np
+from typing import Dict, List
+
+
+def _fit(image: np.ndarray, size: int) -> np.ndarray:
+    # Letterbox into a size x size cell, keeping the aspect ratio.
+    height, width = image.shape[:2]
+    scale = size / float(max(height, width))
+    resized = cv.resize(image, (max(1, int(width * scale)), max(1, int(height * scale))),
+                        interpolation=cv.INTER_AREA if scale < 1 else cv.INTER_LINEAR)
+    cell = np.zeros((size, size, 3), dtype=np.uint8)
+    top = (size - resized.shape[0]) // 2
+    left = (size - resized.shape[1]) // 2
+    cell[top:top + resized.shape[0], left:left + resized.shape[1]] = resized
+    return cell
+
+
+def select_crops(detections: List[Dict], max_crops: int) -> List[Dict]:
+    # Largest, most confident detections first; small far-away boxes are the first to go.
+    ranked = sorted(detections, key=lambda d: d.get('area', 0) * d.get('confidence', 1.0), reverse=True)
+    return ranked[:max_crops]
+
+
+def build_mosaic(frame: np.ndarray, detections: List[Dict], size: int = 336, max_crops: int = 8,
+                 margin: float = 0.15) -> np.ndarray:
+    # A size x size BGR image: a low-resolution view of the whole frame in the first cell, then one cell per
+    # detection crop in reading order. LLaVA-NeXT then needs the fewest anyres tiles instead of a full-frame grid.
+    height, width = frame.shape[:2]
+    crops = select_crops(detections, max_crops)
+    cols = math.ceil(math.sqrt(len(crops) + 1))
+    rows = math.ceil((len(crops) + 1) / cols)
+    cell = size // max(cols, rows)
+
+    cells = [_fit(frame, cell)]
+    for detection in crops:
+        x1, y1, x2, y2 = detection['bbox']
+        pad_x = int((x2 - x1) * margin)
+        pad_y = int((y2 - y1) * margin)
+        x1, y1 = max(0, x1 - pad_x), max(0, y1 - pad_y)
+        x2, y2 = min(width, x2 + pad_x), min(height, y2 + pad_y)
+        if x2 > x1 and y2 > y1:
+            cells.append(_fit(frame[y1:y2, x1:x2], cell))
+
+    mosaic = np.zeros((size, size, 3), dtype=np.uint8)
+    for index, image in enumerate(cells):
+        row, col = divmod(index, cols)
+        mosaic[row * cell:(row + 1) * cell, col * cell:(col + 1) * cell] = image
+    return mosaic
+
+
+def mosaic_note(detections: List[Dict], max_crops: int) -> str:
+    crops = select_crops(detections, max_crops)
+    labels = ", ".join(f"{index + 1}: {d['class_name']}" for index, d in enumerate(crops))
+    return ("The image is a mosaic: the first tile is a small view of the whole scene, the following tiles are "
+            f"close-up crops of the detected objects in reading order ({labels}).")
@@ -0,0 +1,89 @@
+import time
+import cv2 as cv
+import numpy as np
+from typing import List, Optional
+
+
+class MotionDetector:
+    def __init__(self, method: str = "diff", width: int = 160, pixel_threshold: int = 25, min_area: float = 0.002,
+                 rois: List[List[List[int]]] = None, learning_rate: float = 0.05, refresh_interval: float = 10.0):
+        if method not in ("diff", "mog2"):
+            raise ValueError(f"Unknown motion method '{method}', expected 'diff' or 'mog2'")
+        self.method = method
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.min_area = min_area
+        self.rois = rois or []
+        self.learning_rate = learning_rate
+        self.refresh_interval = refresh_interval
+        self.last_ratio = 0.0
+        self._background = None
+        self._subtractor = None
+        self._roi_mask = None
+        self._roi_pixels = 0
+        self._shape = None
+        self._last_pass = None
+
+    def reset(self):
+        self._background = None
+        self._subtractor = None
+        self._shape = None
+
+    def _prepare(self, frame: np.ndarray) -> np.ndarray:
+        height, width = frame.shape[:2]
+        scale = self.width / float(width)
+        small = cv.resize(frame, (self.width, max(1, int(height * scale))), interpolation=cv.INTER_AREA)
+        gray = cv.cvtColor(small, cv.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        gray = cv.GaussianBlur(gray, (5, 5), 0)
+
+        if self._shape != gray.shape:
+            self._shape = gray.shape
+            self._background = None
+            self._subtractor = None
+            self._build_roi_mask(scale)
+        return gray
+
+    def _build_roi_mask(self, scale: float):
+        if not self.rois:
+            self._roi_mask = None
+            self._roi_pixels = self._shape[0] * self._shape[1]
+            return
+        mask = np.zeros(self._shape, dtype=np.uint8)
+        for polygon in self.rois:
+            points = np.round(np.asarray(polygon, dtype=np.float32) * scale).astype(np.int32)
+            cv.fillPoly(mask, [points], 255)
+        self._roi_mask = mask > 0
+        self._roi_pixels = max(1, int(np.count_nonzero(self._roi_mask)))
+
+    def _foreground(self, gray: np.ndarray) -> Optional[np.ndarray]:
+        if self.method == "mog2":
+            if self._subtractor is None:
+                self._subtractor = cv.createBackgroundSubtractorMOG2(detectShadows=True)
+            # MOG2 marks shadows as 127; only confident foreground (255) counts as motion.
+            return self._subtractor.apply(gray) > 200
+
+        if self._background is None:
+            self._background = gray.astype(np.float32)
+            return None
+        diff = cv.absdiff(gray, cv.convertScaleAbs(self._background))
+        cv.accumulateWeighted(gray, self._background, self.learning_rate)
+        return diff > self.pixel_threshold
+
+    def has_motion(self, frame: np.ndarray, now: float = None) -> bool:
+        now = time.monotonic() if now is None else now
+        foreground = self._foreground(self._prepare(frame))
+
+        if foreground is None or self._last_pass is None:
+            moved = True
+        else:
+            if self._roi_mask is not None:
+                foreground &= self._roi_mask
+            self.last_ratio = np.count_nonzero(foreground) / float(self._roi_pixels)
+            moved = bool(self.last_ratio >= self.min_area)
+
+        # Re-run detection now and then even on a still scene, so a reused result cannot go stale forever.
+        if not moved and now - self._last_pass >= self.refresh_interval:
+            moved = True
+        if moved:
+            self._last_pass = now
+        return moved
@@ -0,0 +1,32 @@
+class AdaptiveRateController:
+    def __init__(self, min_interval: float = 0.0, max_interval: float = 1.0, idle_backoff: float = 1.5,
+                 smoothing: float = 0.2):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.idle_backoff = idle_backoff
+        self.smoothing = smoothing
+        self.interval = min_interval
+        self.cost = 0.0
+        self.last_run = None
+
+    def due_in(self, now: float) -> float:
+        if self.last_run is None:
+            return 0.0
+        return max(0.0, self.last_run + self.interval - now)
+
+    def mark(self, now: float):
+        self.last_run = now
+
+    def update(self, cost: float, active: bool):
+        self.cost = cost if self.cost == 0.0 else self.cost + self.smoothing * (cost - self.cost)
+
+        if active:
+            # Something is happening: detect as often as the pipeline can keep up with.
+            self.interval = self.min_interval
+        else:
+            # Idle scene: back off geometrically, starting from what a frame actually costs.
+            self.interval = min(self.max_interval, max(self.interval, self.cost, 0.01) * self.idle_backoff)
+
+    def frames_to_skip(self, fps: float) -> int:
+        # For file playback: how many frames elapse while one is processed or while waiting for the next slot.
+        return max(0, int(max(self.interval, self.cost) * fps) - 1)
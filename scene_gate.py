@@ -0,0 +1,77 @@
+import math
+import time
+from typing import Dict, List, Optional
+
+
+def box_iou(a: List[int], b: List[int]) -> float:
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, ix2 - ix1) * max(0, iy2 - iy1)
+    if inter == 0:
+        return 0.0
+    area_a = (a[2] - a[0]) * (a[3] - a[1])
+    area_b = (b[2] - b[0]) * (b[3] - b[1])
+    return inter / float(area_a + area_b - inter)
+
+
+class SceneGate:
+    def __init__(self, count_delta: int = 1, min_iou: float = 0.5, max_displacement: float = 0.25,
+                 max_staleness: float = 60.0):
+        self.count_delta = count_delta
+        self.min_iou = min_iou
+        self.max_displacement = max_displacement
+        self.max_staleness = max_staleness
+        self._states = {}
+
+    def reset(self, camera: str = None):
+        if camera is None:
+            self._states.clear()
+        else:
+            self._states.pop(camera, None)
+
+    def should_summarize(self, detections: List[Dict], camera: str = "default", now: Optional[float] = None) -> bool:
+        now = time.monotonic() if now is None else now
+        state = self._states.get(camera)
+
+        if state is None or now - state["time"] >= self.max_staleness or self.has_changed(state["detections"], detections):
+            self._states[camera] = {"detections": detections, "time": now}
+            return True
+        return False
+
+    def has_changed(self, previous: List[Dict], current: List[Dict]) -> bool:
+        previous_by_class = self._group_by_class(previous)
+        current_by_class = self._group_by_class(current)
+
+        for class_name in set(previous_by_class) | set(current_by_class):
+            before = previous_by_class.get(class_name, [])
+            after = current_by_class.get(class_name, [])
+            if abs(len(before) - len(after)) >= self.count_delta:
+                return True
+            if self._boxes_moved(before, after):
+                return True
+        return False
+
+    def _boxes_moved(self, previous: List[List[int]], current: List[List[int]]) -> bool:
+        unmatched = list(previous)
+        for box in current:
+            if not unmatched:
+                # More boxes than before but below count_delta; nothing left to compare against.
+                return False
+            best = max(unmatched, key=lambda other: box_iou(box, other))
+            if box_iou(box, best) < self.min_iou:
+                return True
+
+            diagonal = math.hypot(best[2] - best[0], best[3] - best[1]) or 1.0
+            dx = (box[0] + box[2] - best[0] - best[2]) / 2.0
+            dy = (box[1] + box[3] - best[1] - best[3]) / 2.0
+            if math.hypot(dx, dy) / diagonal > self.max_displacement:
+                return True
+            unmatched.remove(best)
+        return False
+
+    @staticmethod
+    def _group_by_class(detections: List[Dict]) -> Dict[str, List[List[int]]]:
+        groups = {}
+        for detection in detections:
+            groups.setdefault(detection["class_name"], []).append(detection["bbox"])
+        return groups
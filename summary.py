@@ -1,67 +1,293 @@
+import copy
+import re
+import threading
 import numpy as np
-from typing import List, Dict
+from typing import Dict, Iterator, List, Optional
 import torch
 from PIL import Image
 import io
 import time
 from llava.model.builder import load_pretrained_model
 from llava.utils import disable_torch_init
+from transformers import DynamicCache, StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer
 from helper import device, load_json_variable
+from metrics import span, LLM_CALLS, SUMMARY_BATCH_SIZE
+from summary_cache import SummaryCache
+from model_loader import BackgroundModel, READY, FAILED
+from vision_logging import get_logger
 import streamlit as st
 
+log = get_logger("summary")
+
+# Everything that does not change between frames comes before the image, so its KV cache can be computed once.
+INSTRUCTIONS = "You are a security surveillance AI. Provide a brief security assessment of the image and detection data that follow, in the format: '[Number] [objects] detected [location/activity] — [security assessment/concern]'. Focus on potential security issues, unusual activities, or normal situations. Examples: '1 person detected in bedroom during daytime — normal activity', '3 people detected near entrance after hours — possible security concern', '1 person detected in restricted area — unauthorized access alert'."
+
+
+# A finished assessment: text, a dash, then the assessment up to a sentence end that is followed by whitespace.
+# The end of a partial decode never counts ("confidence 0." may continue), and only a line holding the dashed
+# assessment ends it, so a header line like "Assessment:" does not.
+ASSESSMENT_END = re.compile(r"\S[^\n]*?(—| - )[^\n]*?\S([.!?]\s|\n)")
+
+
+def assessment_complete(text: str) -> bool:
+    return ASSESSMENT_END.search(text) is not None
+
+
+class AssessmentComplete(StoppingCriteria):
+    def __init__(self, tokenizer, prompt_length: int):
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+
+    def __call__(self, input_ids, scores, **kwargs):
+        texts = self.tokenizer.batch_decode(input_ids[:, self.prompt_length:], skip_special_tokens=True)
+        return torch.tensor([assessment_complete(text) for text in texts], dtype=torch.bool, device=input_ids.device)
+
+
+class LiveSummaries:
+    # Latest summary per camera, updated while it is still being generated, for the dashboard to poll.
+    def __init__(self):
+        self.summaries: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def update(self, camera: str, text: str, done: bool = False):
+        with self._lock:
+            self.summaries[camera] = {'summary': text, 'done': done, 'updated': time.time()}
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {camera: dict(entry) for camera, entry in self.summaries.items()}
+
+
+LIVE_SUMMARIES = LiveSummaries()
+
+
 class Summary:
-    def __init__(self, model_components):
-        self.model_components = model_components
+    def __init__(self, model_components, cache: SummaryCache = None):
+        # model_components is either the loaded components or a BackgroundModel that is still loading them.
+        self.loader = model_components if isinstance(model_components, BackgroundModel) else None
+        self._components = None if self.loader else model_components
+        if cache is None and load_json_variable("summary_cache"):
+            cache = SummaryCache.from_config()
+        self.cache = cache
+
+    @property
+    def model_components(self) -> Optional[Dict]:
+        if self._components is None and self.loader is not None and self.loader.ready():
+            self._components = self.loader.components
+        return self._components
+
+    @property
+    def state(self) -> str:
+        if self.loader is not None:
+            return self.loader.state
+        return READY if self._components else FAILED
+
+    def ready(self) -> bool:
+        return self.state == READY
+
+    def wait(self, timeout: float = None) -> bool:
+        return self.loader.wait(timeout) if self.loader is not None else self.ready()
+
+    def cached(self, request: Dict) -> Optional[str]:
+        if self.cache is None or request.get('cache_key') is None:
+            return None
+        return self.cache.get(request['cache_key'])
+
+    def remember(self, request: Dict, summary_text: str):
+        if self.cache is not None and request.get('cache_key') is not None and summary_text:
+            self.cache.put(request['cache_key'], summary_text)
+
+    def build_prompt(self, detections, object_counts, zones: str = None, image_note: str = None) -> str:
+        zone_text = f" Objects by zone: {zones}." if zones else ""
+        note_text = f"{image_note} " if image_note else ""
+        return f"{note_text}Analyze this image and the detection data: {detections}. Total objects detected: {object_counts}.{zone_text}"
+
+    def build_text(self, request: Dict, image_token: str = "<image>") -> str:
+        # Written out by hand in the Mistral [INST] format: the chat template moves every image ahead of the text,
+        # which would leave only "[INST] " in front of the image for the prefix cache.
+        prompt = self.build_prompt(request['detections'], request['object_counts'], request.get('zones'),
+                                   request.get('image_note'))
+        return f"[INST] {INSTRUCTIONS}\n{image_token}\n{prompt} [/INST]"
 
-    def generate_summary(self, detections, object_counts, image: Image.Image, ):
+    def prefix_cache(self):
+        # Computed once per loaded model and kept with its components, so every Summary sharing them reuses it.
+        # Holds None when the prefix would not cover the instructions, so callers prefill the whole prompt instead.
+        components = self.model_components
+        if 'prefix_cache' in components:
+            return components['prefix_cache']
 
+        processor = components['processor']
+        model = components['model']
+        rendered = self.build_text({'detections': "", 'object_counts': 0}, processor.image_token)
+        prefix_text = rendered[:rendered.index(processor.image_token)]
+        # The last token could merge with the image marker when tokenized as part of the full prompt.
+        prefix_ids = processor.tokenizer(prefix_text, return_tensors="pt")['input_ids'][:, :-1].to(model.device)
+        instruction_tokens = len(processor.tokenizer(INSTRUCTIONS, add_special_tokens=False)['input_ids'])
+        if prefix_ids.shape[1] < instruction_tokens:
+            log.warning("prompt prefix is shorter than the instructions, not caching it",
+                        tokens=prefix_ids.shape[1], instruction_tokens=instruction_tokens)
+            components['prefix_cache'] = None
+            return None
+
+        with span("summary_prefix_prefill"), torch.inference_mode():
+            cache = model(input_ids=prefix_ids, past_key_values=DynamicCache(), use_cache=True).past_key_values
+        components['prefix_cache'] = (prefix_ids, cache)
+        log.info("prompt prefix cached", tokens=prefix_ids.shape[1])
+        return components['prefix_cache']
+
+    def generate_summary(self, detections, object_counts, image: Image.Image, zones: str = None, image_note: str = None):
+        return self.generate_summaries([{
+            'detections': detections,
+            'object_counts': object_counts,
+            'image': image,
+            'zones': zones,
+            'image_note': image_note
+        }])[0]
+
+    def prepare(self, requests: List[Dict]):
+        processor = self.model_components['processor']
+        model = self.model_components['model']
+        with span("summary_processor"):
+            prompts = [self.build_text(request, processor.image_token) for request in requests]
+            # Left padding keeps every prompt's last token at the end, where generation continues.
+            processor.tokenizer.padding_side = "left"
+            inputs = processor(text=prompts, images=[request['image'] for request in requests], padding=True,
+                               return_tensors="pt").to(model.device)
+
+        # Left padding shifts the prefix in every row but the longest, so only single frames reuse the prefix cache.
+        cache = None
+        if len(requests) == 1 and load_json_variable("summary_prefix_cache"):
+            cache = self.prefill_with_prefix(inputs)
+        return inputs, cache
+
+    def run_generate(self, inputs, cache=None, streamer=None):
+        processor = self.model_components['processor']
+        model = self.model_components['model']
+        if cache is not None:
+            # The image is already in the cache; generate only has to feed the last prompt token.
+            model_inputs = {'input_ids': inputs['input_ids'], 'attention_mask': inputs['attention_mask'],
+                            'past_key_values': cache}
+        else:
+            model_inputs = dict(inputs)
+
+        stopping_criteria = None
+        if load_json_variable("summary_early_stop"):
+            stopping_criteria = StoppingCriteriaList([AssessmentComplete(processor.tokenizer,
+                                                                         inputs['input_ids'].shape[1])])
+
+        LLM_CALLS.inc(len(inputs['input_ids']))
+        SUMMARY_BATCH_SIZE.observe(len(inputs['input_ids']))
+        with span("summary_generate"), torch.inference_mode():
+            return model.generate(
+                **model_inputs,
+                do_sample=False,
+                max_new_tokens=load_json_variable("max_token"),
+                use_cache=True,
+                pad_token_id=processor.tokenizer.eos_token_id,
+                num_beams=1,
+                early_stopping=True,
+                stopping_criteria=stopping_criteria,
+                streamer=streamer
+            )
+
+    def generate_summaries(self, requests: List[Dict]) -> List[str]:
+        # Each request holds the generate_summary arguments; all of them go through a single model.generate call.
+        if not requests:
+            return []
         if not self.model_components or not self.model_components['processor']:
-            return "Model not loaded properly"
-        
-        # print("Detections:", detections)
-        
-        prompt = f"You are a security surveillance AI. Analyze this image and the detection data: {detections}. Total objects detected: {object_counts}. Provide a brief security assessment in the format: '[Number] [objects] detected [location/activity] — [security assessment/concern]'. Focus on potential security issues, unusual activities, or normal situations. Examples: '1 person detected in bedroom during daytime — normal activity', '3 people detected near entrance after hours — possible security concern', '1 person detected in restricted area — unauthorized access alert'."
+            return ["Model not loaded properly"] * len(requests)
+
+        summaries = [self.cached(request) for request in requests]
+        misses = [index for index, summary_text in enumerate(summaries) if summary_text is None]
+        if not misses:
+            return summaries
 
         try:
-            processor = self.model_components['processor']
-            model = self.model_components['model']
-            
-            conversation = [
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "image"},
-                        {"type": "text", "text": prompt}
-                    ]
-                }
-            ]
-            
-            prompt_for_model = processor.apply_chat_template(conversation, add_generation_prompt=True)
-            inputs = processor(text=prompt_for_model, images=[image], return_tensors="pt").to(model.device)
-            
-            with torch.inference_mode():
-                output = model.generate(
-                    **inputs,
-                    do_sample=False,
-                    max_new_tokens=load_json_variable("max_token"),
-                    use_cache=True,
-                    pad_token_id=processor.tokenizer.eos_token_id,
-                    num_beams=1,
-                    early_stopping=True
-                )
-            
-            generated_text = processor.decode(output[0], skip_special_tokens=True)
-            
-            if "assistant\n" in generated_text:
-                response = generated_text.split("assistant\n")[-1].strip()
-            elif "[/INST]" in generated_text:
-                response = generated_text.split("[/INST]")[-1].strip()
-            else:
-                response = generated_text.strip()
-
-            # print(response)
-            
-            return response
-            
+            pending = [requests[index] for index in misses]
+            inputs, cache = self.prepare(pending)
+            output = self.run_generate(inputs, cache)
+
+            with span("summary_decode"):
+                # Only the generated tail of each row; the prompt and its padding are dropped.
+                generated = self.model_components['processor'].batch_decode(output[:, inputs['input_ids'].shape[1]:],
+                                                                            skip_special_tokens=True)
+
+            for index, request, text in zip(misses, pending, generated):
+                summaries[index] = text.strip()
+                self.remember(request, summaries[index])
+            return summaries
+
         except Exception as e:
-            return f"Error processing: {str(e)}"
+            for index in misses:
+                summaries[index] = f"Error processing: {str(e)}"
+            return summaries
+
+    def stream_summary(self, request: Dict) -> Iterator[str]:
+        # Yields the summary so far after every decoded chunk; the last value is the finished summary.
+        if not self.model_components or not self.model_components['processor']:
+            yield "Model not loaded properly"
+            return
+
+        summary_text = self.cached(request)
+        if summary_text is not None:
+            yield summary_text
+            return
+
+        try:
+            inputs, cache = self.prepare([request])
+        except Exception as e:
+            yield f"Error processing: {str(e)}"
+            return
+
+        streamer = TextIteratorStreamer(self.model_components['processor'].tokenizer, skip_prompt=True,
+                                        skip_special_tokens=True)
+        errors = []
+
+        def generate():
+            try:
+                self.run_generate(inputs, cache, streamer=streamer)
+            except Exception as e:
+                errors.append(e)
+                # Unblocks the loop below, which would otherwise wait for text that never comes.
+                streamer.end()
+
+        thread = threading.Thread(target=generate, name="summary-stream", daemon=True)
+        thread.start()
+        text = ""
+        for chunk in streamer:
+            text += chunk
+            if text.strip():
+                yield text.strip()
+        thread.join()
+        if errors:
+            yield f"Error processing: {str(errors[0])}"
+        elif not text.strip():
+            yield ""
+        else:
+            self.remember(request, text.strip())
+
+    def prefill_with_prefix(self, inputs):
+        # Copies the cached prefix and prefills the rest of the prompt, image included, up to its last token.
+        # Returns None when there is no cached prefix or the prompt does not start with it, and generate prefills it all.
+        model = self.model_components['model']
+        cached = self.prefix_cache()
+        if cached is None:
+            return None
+        prefix_ids, prefix = cached
+        input_ids = inputs['input_ids']
+        length = prefix_ids.shape[1]
+        if input_ids.shape[1] <= length + 1 or not torch.equal(input_ids[:, :length], prefix_ids):
+            log.debug("prompt does not start with the cached prefix")
+            return None
+
+        cache = copy.deepcopy(prefix)
+        end = input_ids.shape[1] - 1
+        with span("summary_prefill"), torch.inference_mode():
+            model(input_ids=input_ids[:, length:end],
+                  pixel_values=inputs['pixel_values'],
+                  image_sizes=inputs.get('image_sizes'),
+                  attention_mask=inputs['attention_mask'][:, :end],
+                  past_key_values=cache,
+                  cache_position=torch.arange(length, end, device=input_ids.device),
+                  use_cache=True)
+        return cache
@@ -0,0 +1,123 @@
+import sqlite3
+import threading
+import time
+import cv2 as cv
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from helper import load_json_variable
+from metrics import SUMMARY_CACHE
+
+
+def dhash(image: np.ndarray, size: int = 8) -> int:
+    # Difference hash: one bit per horizontally adjacent pixel pair of a (size + 1) x size grayscale thumbnail.
+    gray = image if image.ndim == 2 else cv.cvtColor(image, cv.COLOR_BGR2GRAY)
+    small = cv.resize(gray, (size + 1, size), interpolation=cv.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def detection_signature(detections: List[Dict], shape: Tuple[int, ...], grid: int = 8) -> str:
+    # Class and box corners snapped to a grid x grid lattice over the frame, sorted so detection order does not matter.
+    height, width = shape[:2]
+    boxes = []
+    for detection in detections:
+        x1, y1, x2, y2 = detection['bbox']
+        boxes.append((detection['class_name'], int(x1 * grid / width), int(y1 * grid / height),
+                      int(x2 * grid / width), int(y2 * grid / height)))
+    return ";".join(",".join(map(str, box)) for box in sorted(boxes))
+
+
+def summary_key(frame: np.ndarray, detections: List[Dict], grid: int = 8) -> Tuple[str, int]:
+    return detection_signature(detections, frame.shape, grid), dhash(frame)
+
+
+class SummaryCache:
+    def __init__(self, capacity: int = 256, ttl: float = 300.0, max_distance: int = 6, path: str = None):
+        # Entries match on the exact detection signature and on a frame hash within max_distance bits.
+        self.capacity = max(1, int(capacity))
+        self.ttl = ttl
+        self.max_distance = max_distance
+        self.entries: "OrderedDict[Tuple[str, int], Tuple[str, float]]" = OrderedDict()
+        self.hashes: Dict[str, set] = {}
+        self._lock = threading.Lock()
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS summaries (
+                    signature TEXT NOT NULL,
+                    hash TEXT NOT NULL,
+                    summary TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    PRIMARY KEY (signature, hash)
+                );
+                CREATE INDEX IF NOT EXISTS idx_summaries_created ON summaries (created);
+            """)
+            self._conn.commit()
+
+    @classmethod
+    def from_config(cls) -> "SummaryCache":
+        return cls(capacity=load_json_variable("summary_cache_size"), ttl=load_json_variable("summary_cache_ttl"),
+                   max_distance=load_json_variable("summary_cache_distance"),
+                   path=load_json_variable("summary_cache_path") or None)
+
+    def __len__(self):
+        with self._lock:
+            return len(self.entries)
+
+    def _match(self, frame_hash: int, candidates, now: float) -> Optional[Tuple[int, str, float]]:
+        best = None
+        for candidate, summary, created in candidates:
+            if now - created > self.ttl:
+                continue
+            distance = bin(candidate ^ frame_hash).count("1")
+            if distance <= self.max_distance and (best is None or distance < best[0]):
+                best = (distance, candidate, summary, created)
+        return best[1:] if best else None
+
+    def get(self, key: Tuple[str, int]) -> Optional[str]:
+        signature, frame_hash = key
+        now = time.time()
+        with self._lock:
+            candidates = [(h,) + self.entries[(signature, h)] for h in self.hashes.get(signature, ())]
+            match = self._match(frame_hash, candidates, now)
+            if match is not None:
+                self.entries.move_to_end((signature, match[0]))
+            elif self._conn is not None:
+                rows = self._conn.execute("SELECT hash, summary, created FROM summaries WHERE signature = ? AND created >= ?",
+                                          (signature, now - self.ttl)).fetchall()
+                match = self._match(frame_hash, [(int(h, 16), summary, created) for h, summary, created in rows], now)
+                if match is not None:
+                    self._insert(signature, *match)
+
+        SUMMARY_CACHE.labels("hit" if match is not None else "miss").inc()
+        return match[1] if match is not None else None
+
+    def put(self, key: Tuple[str, int], summary: str):
+        signature, frame_hash = key
+        created = time.time()
+        with self._lock:
+            self._insert(signature, frame_hash, summary, created)
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute("INSERT OR REPLACE INTO summaries VALUES (?, ?, ?, ?)",
+                                       (signature, format(frame_hash, 'x'), summary, created))
+                    self._conn.execute("DELETE FROM summaries WHERE created < ?", (created - self.ttl,))
+
+    def _insert(self, signature: str, frame_hash: int, summary: str, created: float):
+        self.entries[(signature, frame_hash)] = (summary, created)
+        self.entries.move_to_end((signature, frame_hash))
+        self.hashes.setdefault(signature, set()).add(frame_hash)
+        while len(self.entries) > self.capacity:
+            (old_signature, old_hash), _ = self.entries.popitem(last=False)
+            hashes = self.hashes[old_signature]
+            hashes.discard(old_hash)
+            if not hashes:
+                del self.hashes[old_signature]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,194 @@
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from vision_logging import get_logger
+from metrics import DROPPED_FRAMES
+
+log = get_logger("summary_worker")
+
+DROP_OLDEST = "drop_oldest"
+KEEP_LATEST_PER_CAMERA = "keep_latest_per_camera"
+BLOCK = "block"
+DROP_POLICIES = (DROP_OLDEST, KEEP_LATEST_PER_CAMERA, BLOCK)
+
+
+class SummaryJob:
+    def __init__(self, frame, detections: List[Dict], object_counts: Dict, timestamp: str = None, camera: str = "default",
+                 track_events: List[Dict] = None, alert_data: Dict = None):
+        self.frame = frame
+        self.detections = detections
+        self.object_counts = object_counts
+        self.timestamp = timestamp or datetime.now().isoformat()
+        self.camera = camera
+        self.track_events = track_events or []
+        self.alert_data = alert_data
+        self.enqueued_at = time.monotonic()
+
+    def raised_alert(self) -> bool:
+        return bool((self.alert_data or {}).get('should_alert'))
+
+    def absorb(self, older: "SummaryJob") -> bool:
+        # A replaced job hands over what only happens once: track events and a freshly raised alert.
+        # Returns False when the older job still holds an alert this one could not take over.
+        self.track_events = older.track_events + self.track_events
+        older.track_events = []
+        if older.raised_alert() and not self.raised_alert():
+            self.alert_data = older.alert_data
+            return True
+        return not older.raised_alert()
+
+
+class SummaryQueue:
+    def __init__(self, maxsize: int = 4, drop_policy: str = DROP_OLDEST,
+                 on_drop: Callable[[SummaryJob], None] = None):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy '{drop_policy}', expected one of {DROP_POLICIES}")
+        self.maxsize = max(1, int(maxsize))
+        self.drop_policy = drop_policy
+        # Gets every job that leaves the queue unsummarized while it still carries an alert or track events.
+        self.on_drop = on_drop
+        self.dropped = 0
+        self._unfinished = 0
+        self._jobs = deque()
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        with self._cond:
+            return len(self._jobs)
+
+    def put(self, job: SummaryJob, timeout: Optional[float] = None) -> bool:
+        lost = []
+        try:
+            with self._cond:
+                return self._put(job, timeout, lost)
+        finally:
+            # Outside the lock: recording an event can be slow and must not stall the capture loop's next put.
+            for dropped in lost:
+                if self.on_drop is not None and (dropped.raised_alert() or dropped.track_events):
+                    self.on_drop(dropped)
+
+    def _put(self, job: SummaryJob, timeout: Optional[float], lost: List[SummaryJob]) -> bool:
+        if self._closed:
+            return False
+
+        if self.drop_policy == KEEP_LATEST_PER_CAMERA:
+            for i, pending in enumerate(self._jobs):
+                if pending.camera == job.camera:
+                    # Replace in place so the camera keeps its turn in the queue.
+                    if not job.absorb(pending):
+                        lost.append(pending)
+                    self._jobs[i] = job
+                    self._drop()
+                    return True
+
+        if len(self._jobs) >= self.maxsize:
+            if self.drop_policy == BLOCK:
+                if not self._cond.wait_for(lambda: len(self._jobs) < self.maxsize or self._closed, timeout):
+                    self._drop()
+                    lost.append(job)
+                    return False
+                if self._closed:
+                    return False
+            else:
+                # The oldest job that raised no alert goes first; alert jobs only when nothing else is left.
+                index = next((i for i, pending in enumerate(self._jobs) if not pending.raised_alert()), 0)
+                lost.append(self._jobs[index])
+                del self._jobs[index]
+                self._unfinished -= 1
+                self._drop()
+
+        self._jobs.append(job)
+        self._unfinished += 1
+        self._cond.notify_all()
+        return True
+
+    def _drop(self):
+        self.dropped += 1
+        DROPPED_FRAMES.labels("summary_queue").inc()
+
+    def get(self, timeout: Optional[float] = None) -> Optional[SummaryJob]:
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._jobs or self._closed, timeout):
+                return None
+            if not self._jobs:
+                return None
+            job = self._jobs.popleft()
+            self._cond.notify_all()
+            return job
+
+    def get_batch(self, max_size: int, max_wait: float = 0.0, timeout: Optional[float] = None) -> List[SummaryJob]:
+        # Blocks for the first job, then waits at most max_wait for more to fill the batch.
+        max_size = max(1, min(int(max_size), self.maxsize))
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._jobs or self._closed, timeout):
+                return []
+            if self._jobs and max_wait > 0:
+                self._cond.wait_for(lambda: len(self._jobs) >= max_size or self._closed, max_wait)
+            batch = [self._jobs.popleft() for _ in range(min(max_size, len(self._jobs)))]
+            self._cond.notify_all()
+            return batch
+
+    def task_done(self, count: int = 1):
+        with self._cond:
+            self._unfinished -= count
+            self._cond.notify_all()
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        with self._cond:
+            return self._cond.wait_for(lambda: self._unfinished <= 0, timeout)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class SummaryWorker:
+    def __init__(self, handler: Callable[[SummaryJob], None], queue: SummaryQueue = None,
+                 batch_handler: Callable[[List[SummaryJob]], None] = None, max_batch: int = 1, max_wait: float = 0.0):
+        self.handler = handler
+        self.queue = queue if queue is not None else SummaryQueue()
+        self.batch_handler = batch_handler
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max(0.0, float(max_wait))
+        self.processed = 0
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="summary-worker", daemon=True)
+            self._thread.start()
+        return self
+
+    def submit(self, job: SummaryJob, timeout: Optional[float] = None) -> bool:
+        return self.queue.put(job, timeout)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        return self.queue.join(timeout)
+
+    def stop(self, drain: bool = True, timeout: Optional[float] = None):
+        if drain:
+            self.flush(timeout)
+        self.queue.close()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        batching = self.batch_handler is not None and self.max_batch > 1
+        while True:
+            jobs = self.queue.get_batch(self.max_batch, self.max_wait) if batching else [self.queue.get()]
+            if not jobs or jobs[0] is None:
+                break
+            try:
+                if len(jobs) > 1:
+                    self.batch_handler(jobs)
+                else:
+                    self.handler(jobs[0])
+            except Exception as e:
+                log.error("error in summary worker", cameras=[job.camera for job in jobs], error=e)
+            finally:
+                self.processed += len(jobs)
+                self.queue.task_done(len(jobs))
@@ -0,0 +1,145 @@
+import itertools
+import time
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from typing import Dict, List, Tuple
+
+NEW = "new"
+LOST = "lost"
+LOITERING = "loitering"
+
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+    ix1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    iy1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    ix2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    iy2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(ix2 - ix1, 0, None) * np.clip(iy2 - iy1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-9), 0.0)
+
+
+class Track:
+    def __init__(self, track_id: int, detection: Dict, now: float):
+        self.track_id = track_id
+        self.class_id = detection["class_id"]
+        self.class_name = detection["class_name"]
+        self.bbox = np.asarray(detection["bbox"], dtype=np.float64)
+        self.velocity = np.zeros(2)
+        self.first_seen = now
+        self.last_seen = now
+        self.hits = 1
+        self.confirmed = False
+        self.loitering = False
+
+    @property
+    def center(self) -> np.ndarray:
+        return (self.bbox[:2] + self.bbox[2:]) / 2.0
+
+    @property
+    def dwell(self) -> float:
+        return self.last_seen - self.first_seen
+
+    def predict(self, now: float) -> np.ndarray:
+        shift = self.velocity * (now - self.last_seen)
+        return self.bbox + np.concatenate([shift, shift])
+
+    def update(self, bbox: List[int], now: float, smoothing: float):
+        bbox = np.asarray(bbox, dtype=np.float64)
+        dt = now - self.last_seen
+        if dt > 0:
+            # Constant-velocity model with an exponentially smoothed velocity estimate (alpha-beta filter).
+            measured = ((bbox[:2] + bbox[2:]) / 2.0 - self.center) / dt
+            self.velocity += smoothing * (measured - self.velocity)
+        self.bbox = bbox
+        self.last_seen = now
+        self.hits += 1
+
+    def as_dict(self) -> Dict:
+        return {
+            "track_id": self.track_id,
+            "class_name": self.class_name,
+            "bbox": [int(v) for v in self.bbox],
+            "first_seen": self.first_seen,
+            "last_seen": self.last_seen,
+            "dwell": round(self.dwell, 2),
+            "velocity": [round(float(v), 1) for v in self.velocity],
+            "hits": self.hits
+        }
+
+
+class Tracker:
+    def __init__(self, iou_threshold: float = 0.3, min_hits: int = 3, lost_after: float = 2.0,
+                 loiter_seconds: float = 30.0, smoothing: float = 0.5):
+        self.iou_threshold = iou_threshold
+        self.min_hits = min_hits
+        self.lost_after = lost_after
+        self.loiter_seconds = loiter_seconds
+        self.smoothing = smoothing
+        self.tracks: List[Track] = []
+        self._ids = itertools.count(1)
+
+    def active_tracks(self) -> List[Dict]:
+        return [track.as_dict() for track in self.tracks if track.confirmed]
+
+    def _associate(self, detections: List[Dict], now: float) -> List[Tuple[int, int]]:
+        if not self.tracks or not detections:
+            return []
+        predicted = np.array([track.predict(now) for track in self.tracks])
+        boxes = np.array([d["bbox"] for d in detections], dtype=np.float64)
+        iou = iou_matrix(predicted, boxes)
+        # Never match across classes.
+        track_classes = np.array([track.class_id for track in self.tracks])
+        detection_classes = np.array([d["class_id"] for d in detections])
+        iou[track_classes[:, None] != detection_classes[None, :]] = 0.0
+
+        rows, cols = linear_sum_assignment(-iou)
+        return [(r, c) for r, c in zip(rows, cols) if iou[r, c] >= self.iou_threshold]
+
+    def update(self, detections: List[Dict], now: float = None) -> Tuple[List[Dict], List[Dict]]:
+        now = time.monotonic() if now is None else now
+        events = []
+
+        matches = self._associate(detections, now)
+        matched_detections = set()
+        for track_index, detection_index in matches:
+            track = self.tracks[track_index]
+            track.update(detections[detection_index]["bbox"], now, self.smoothing)
+            detections[detection_index]["track_id"] = track.track_id
+            matched_detections.add(detection_index)
+
+        for index, detection in enumerate(detections):
+            if index not in matched_detections:
+                track = Track(next(self._ids), detection, now)
+                self.tracks.append(track)
+                detection["track_id"] = track.track_id
+
+        remaining = []
+        for track in self.tracks:
+            if now - track.last_seen > self.lost_after:
+                if track.confirmed:
+                    events.append(self._event(LOST, track))
+                continue
+            remaining.append(track)
+
+            if not track.confirmed and track.hits >= self.min_hits:
+                track.confirmed = True
+                events.append(self._event(NEW, track))
+            if track.confirmed and not track.loitering and track.dwell >= self.loiter_seconds:
+                track.loitering = True
+                events.append(self._event(LOITERING, track))
+        self.tracks = remaining
+
+        dwell = {track.track_id: round(track.dwell, 2) for track in self.tracks}
+        for detection in detections:
+            detection["dwell"] = dwell.get(detection["track_id"], 0.0)
+        return detections, events
+
+    @staticmethod
+    def _event(kind: str, track: Track) -> Dict:
+        return {"event": kind, "track_id": track.track_id, "class_name": track.class_name,
+                "dwell": round(track.dwell, 2)}
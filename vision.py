@@ -1,113 +1,212 @@
-from ultralytics import YOLO
+import torch
 from helper import device
 import cv2 as cv
-import logging
 import json
 import numpy as np
+import time
 from datetime import datetime
 from typing import Dict, List, Tuple
-from summary import Summary
+from summary import Summary, LIVE_SUMMARIES
+from model_loader import LOADING
+from model_registry import MODELS, acquire_yolo
 from helper import load_json_variable
+from config import get_config
+from vision_logging import get_logger, setup_logging
+from metrics import span, start_metrics_server, FRAMES, DETECTIONS, DROPPED_FRAMES, QUEUE_DEPTH
 from PIL import Image
-import csv
-import os
 from alert_system import AlertSystem
+from summary_worker import SummaryJob, SummaryQueue, SummaryWorker
+from scene_gate import SceneGate
+from detections import records_from_array, records_to_dicts, count_by_class
+from event_store import BufferedEventStore, build_event, create_event_store
+from camera_supervisor import CameraStream, reconnect_limit
+from rate_controller import AdaptiveRateController
+from motion import MotionDetector
+from tracker import Tracker
+from alert_aggregator import CLEARED
+from zones import ZoneEngine, zone_counts, describe_zones
+from baseline import Baseline
+from mosaic import build_mosaic, mosaic_note
+from summary_cache import summary_key
 
-logging.basicConfig(level=logging.INFO)
+setup_logging(level=load_json_variable("log_level"), fmt=load_json_variable("log_format"),
+              rate_limit=load_json_variable("log_rate_limit"), sample_rate=load_json_variable("log_sample_rate"))
+log = get_logger("vision")
+
+NETWORK_SCHEMES = ('tcp://', 'udp://', 'rtsp://', 'rtmp://', 'http://', 'https://')
+get_config().subscribe(lambda changed: setup_logging(level=changed['log_level']), keys=['log_level'])
 
 class Vision:
-    def __init__(self, model_name: str, confidence_threshold: float = 0.6, stream: bool = False, summary_model: Summary = None):
+    def __init__(self, model_name: str, confidence_threshold: float = 0.6, stream: bool = False, summary_model: Summary = None,
+                 async_summary: bool = None, camera: str = "default", event_store: BufferedEventStore = None):
         self.model_name = model_name
         self.confidence_threshold = confidence_threshold
         self.MODEL = self.load_model()
         self.stream = stream
         self.summary = summary_model
-        self.alert_system = AlertSystem()
+        self.alert_system = AlertSystem(self.MODEL.names)
+        self.camera = camera
+        self.last_summary = {}
+        self.last_detections = {}
+        self.motion_filter = load_json_variable("motion_filter")
+        self.motion_detectors = {}
+        self.tracking = load_json_variable("tracking")
+        self.summary_trigger = load_json_variable("summary_trigger")
+        self.trackers = {}
+        self.zones = ZoneEngine()
+        self.summary_image_mode = load_json_variable("summary_image_mode")
+        self.event_store = event_store or create_event_store()
+        self.baseline = None
+        self.baseline_sampled = {}
+        if load_json_variable("baseline"):
+            self.baseline = self.load_baseline()
+            self.alert_system.baseline = self.baseline
+
+        self.scene_gate = None
+        if load_json_variable("scene_gate"):
+            self.scene_gate = SceneGate(count_delta=load_json_variable("gate_count_delta"),
+                                        min_iou=load_json_variable("gate_min_iou"),
+                                        max_displacement=load_json_variable("gate_max_displacement"),
+                                        max_staleness=load_json_variable("gate_max_staleness"))
+
+        if async_summary is None:
+            async_summary = load_json_variable("async_summary")
+        self.summary_worker = None
+        if async_summary:
+            queue = SummaryQueue(maxsize=load_json_variable("summary_queue_size"),
+                                 drop_policy=load_json_variable("summary_drop_policy"),
+                                 on_drop=self.record_dropped)
+            self.summary_worker = SummaryWorker(self.process_job, queue, batch_handler=self.process_jobs,
+                                                max_batch=load_json_variable("summary_batch_size"),
+                                                max_wait=load_json_variable("summary_batch_wait")).start()
+            QUEUE_DEPTH.set_function(lambda: len(queue))
+
+        self.rate_controller = None
+        if load_json_variable("rate_control"):
+            self.rate_controller = AdaptiveRateController(min_interval=load_json_variable("min_detection_interval"),
+                                                          max_interval=load_json_variable("max_detection_interval"),
+                                                          idle_backoff=load_json_variable("idle_backoff"))
+
+        start_metrics_server(load_json_variable("metrics_port"))
+
+        get_config().subscribe(self.apply_config, keys=['model', 'confidence_threshold', 'stream', 'gate_count_delta',
+                                                        'gate_min_iou', 'gate_max_displacement', 'gate_max_staleness',
+                                                        'min_detection_interval', 'max_detection_interval', 'idle_backoff',
+                                                        'summary_image_mode'])
+
+    def apply_config(self, changed: Dict):
+        if 'model' in changed:
+            self.model_name = changed['model']
+            previous = self.model_key
+            self.MODEL = self.load_model()
+            MODELS.release(previous)
+            self.alert_system.set_class_names(self.MODEL.names)
+            log.info("detection model reloaded", model=self.model_name)
+        self.confidence_threshold = changed.get('confidence_threshold', self.confidence_threshold)
+        self.stream = changed.get('stream', self.stream)
+        self.summary_image_mode = changed.get('summary_image_mode', self.summary_image_mode)
+
+        if self.scene_gate:
+            self.scene_gate.count_delta = changed.get('gate_count_delta', self.scene_gate.count_delta)
+            self.scene_gate.min_iou = changed.get('gate_min_iou', self.scene_gate.min_iou)
+            self.scene_gate.max_displacement = changed.get('gate_max_displacement', self.scene_gate.max_displacement)
+            self.scene_gate.max_staleness = changed.get('gate_max_staleness', self.scene_gate.max_staleness)
 
+        if self.rate_controller:
+            self.rate_controller.min_interval = changed.get('min_detection_interval', self.rate_controller.min_interval)
+            self.rate_controller.max_interval = changed.get('max_detection_interval', self.rate_controller.max_interval)
+            self.rate_controller.idle_backoff = changed.get('idle_backoff', self.rate_controller.idle_backoff)
 
     def load_model(self):
-        MODEL = YOLO(self.model_name, verbose=False)
+        # Shared with every other Vision in the process that uses the same weights.
+        self.model_key, MODEL = acquire_yolo(self.model_name)
         # MODEL = MODEL.to(device())
         return MODEL
 
-    def append_to_csv(self, summary_text: str, detections: List[Dict], object_counts: Dict, alert_data: Dict = None):
-        csv_filename = load_json_variable("csv_filename")
-        timestamp = datetime.now().isoformat()
-        
-        file_exists = os.path.isfile(csv_filename)
-        
+    def load_baseline(self) -> Baseline:
+        baseline = Baseline.load(load_json_variable("baseline_path"), class_slots=max(self.MODEL.names) + 2,
+                                 max_count=load_json_variable("baseline_max_count"),
+                                 min_samples=load_json_variable("baseline_min_samples"))
+        with span("baseline_catch_up"):
+            added = baseline.catch_up(self.event_store)
+        log.info("baseline loaded", cameras=len(baseline.histograms), new_events=added)
+        return baseline
+
+    def record_event(self, summary_text: str, detections: List[Dict], object_counts: Dict, alert_data: Dict = None,
+                     camera: str = None, timestamp: str = None):
         try:
-            with open(csv_filename, 'a', newline='', encoding='utf-8') as csvfile:
-                fieldnames = ['timestamp', 'summary', 'detections_json', 'object_counts_json', 'total_objects', 
-                             'alert_status', 'alert_severity', 'alert_type', 'alert_message', 'alert_details_json']
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-                
-                if not file_exists:
-                    writer.writeheader()
-                    print(f"Created new CSV file: {csv_filename}")
-                
-                alert_status = 'false'
-                alert_severity = 'none'
-                alert_type = 'none'
-                alert_message = 'No alerts'
-                alert_details_json = '{}'
-                
-                if alert_data:
-                    alert_status = 'true' if alert_data.get('should_alert', False) else 'false'
-                    alert_severity = alert_data.get('severity', 'none')
-                    alert_type = alert_data.get('alert_type', 'none')
-                    alert_message = alert_data.get('message', 'No alerts')
-                    alert_details_json = json.dumps(alert_data.get('details', {}))
-                
-                writer.writerow({
-                    'timestamp': timestamp,
-                    'summary': summary_text,
-                    'detections_json': json.dumps(detections),
-                    'object_counts_json': json.dumps(object_counts),
-                    'total_objects': len(detections),
-                    'alert_status': alert_status,
-                    'alert_severity': alert_severity,
-                    'alert_type': alert_type,
-                    'alert_message': alert_message,
-                    'alert_details_json': alert_details_json
-                })
-                
-                print(f"Summary and alert data appended to {csv_filename} at {timestamp}")
-                if alert_data and alert_data.get('should_alert', False):
-                    print(f"ALERT: {alert_message}")
-                
+            event = build_event(summary_text, detections, object_counts, alert_data, camera or self.camera, timestamp)
+            self.event_store.append(event)
+
+            log.info("event recorded", camera=event['camera'], timestamp=event['timestamp'],
+                     alert=event['alert_status'])
+            if event['alert_status']:
+                log.warning("alert recorded", camera=event['camera'], message=event['alert_message'])
+
         except Exception as e:
-            print(f"Error writing to CSV: {e}")
+            log.error("error recording event", error=e)
+
 
+    def flush(self, timeout: float = None):
+        if self.summary_worker:
+            self.summary_worker.flush(timeout)
+
+    def close(self):
+        if self.summary_worker:
+            self.summary_worker.stop()
+        self.event_store.close()
+        if self.baseline:
+            self.baseline.save(load_json_variable("baseline_path"))
+        MODELS.release(self.model_key)
+        self.model_key = None
 
     def process_viewpoint(self, source):
         if isinstance(source, str):
             if source.endswith(('.jpg', '.jpeg', '.png')):
                 image = cv.imread(source)
                 self.detect_objects(image)
+                self.flush()
             elif source.endswith(('.mp4', '.avi')):
                 self.process_video(source)
-            elif source.startswith(('tcp://', 'udp://', 'rtsp://', 'rtmp://', 'http://', 'https://')):
+            elif source.startswith(NETWORK_SCHEMES):
                 self.process_video(source)
             else:
-                logging.error("Unsupported file format.")
+                log.error("unsupported file format", source=source)
         else:
             self.process_video(source)
 
+    def is_live_source(self, source) -> bool:
+        return not isinstance(source, str) or source.startswith(NETWORK_SCHEMES)
+
     def process_video(self, video_source):
+        if self.rate_controller and self.is_live_source(video_source):
+            self.process_live(video_source)
+            return
+
         cap = cv.VideoCapture(video_source)
 
 
         cap.set(cv.CAP_PROP_FRAME_WIDTH, 640)
         cap.set(cv.CAP_PROP_FRAME_HEIGHT, 480)
         cap.set(cv.CAP_PROP_FPS, 30)
+        fps = cap.get(cv.CAP_PROP_FPS) or 30
 
-        all_detections = []
         while True:
-            ret, frame = cap.read()
+            with span("capture"):
+                ret, frame = cap.read()
             if not ret:
                 break
-            self.detect_objects(frame)
+            FRAMES.labels(self.camera).inc()
+            started = time.perf_counter()
+            detections = self.detect_objects(frame)
+
+            if self.rate_controller:
+                self.rate_controller.update(time.perf_counter() - started, bool(detections))
+                # grab() advances without decoding, so skipped frames cost almost nothing.
+                for _ in range(self.rate_controller.frames_to_skip(fps)):
+                    if not cap.grab():
+                        break
+                    DROPPED_FRAMES.labels("rate_control").inc()
 
             if self.stream:
                 cv.imshow("VisionSense Live Stream", frame)
@@ -116,74 +215,311 @@ class Vision:
 
         cap.release()
         cv.destroyAllWindows()
+        self.flush()
+
+    def process_live(self, video_source):
+        # The capture thread keeps only the newest frame, so the driver buffer never turns into a backlog.
+        stream = CameraStream(self.camera, video_source, load_json_variable("reconnect_backoff"),
+                              load_json_variable("reconnect_backoff_max"), reconnect_limit()).start()
+        controller = self.rate_controller
+        try:
+            while True:
+                wait = controller.due_in(time.monotonic())
+                if wait > 0:
+                    time.sleep(min(wait, 0.05))
+                    if self.stream and cv.waitKey(1) & 0xFF == ord('q'):
+                        break
+                    continue
+
+                latest = stream.take_latest()
+                if latest is None:
+                    if stream.ended.is_set():
+                        break
+                    time.sleep(0.002)
+                    continue
+                frame, captured_at, skipped = latest
+                if skipped:
+                    DROPPED_FRAMES.labels("rate_control").inc(skipped)
+
+                started = time.monotonic()
+                controller.mark(started)
+                detections = self.detect_objects(frame)
+                controller.update(time.monotonic() - started, bool(detections))
+                stream.stats.record_processed(captured_at, time.monotonic())
+
+                if self.stream:
+                    cv.imshow("VisionSense Live Stream", frame)
+                    if cv.waitKey(1) & 0xFF == ord('q'):
+                        break
+        finally:
+            stream.stop()
+            cv.destroyAllWindows()
+            self.flush()
+
+    def sample_baseline(self, detections: List[Dict], camera: str = None):
+        # Every processed frame, empty and unchanged ones included, at most once per interval per camera,
+        # so each hour's histogram also counts the frames where nothing was there.
+        if not self.baseline:
+            return
+        camera = camera or self.camera
+        now = time.time()
+        if now - self.baseline_sampled.get(camera, 0.0) < load_json_variable("baseline_sample_interval"):
+            return
+        self.baseline_sampled[camera] = now
+        class_ids = np.fromiter((d['class_id'] for d in detections), dtype=np.intp, count=len(detections))
+        self.baseline.update(camera, now, class_ids)
+
+    def dispatch_frame(self, image, detections: List[Dict], object_counts: Dict, camera: str = None):
+        camera = camera or self.camera
+        DETECTIONS.labels(camera).inc(len(detections))
+
+        track_events = []
+        if self.tracking:
+            with span("tracking"):
+                detections, track_events = self.tracker_for(camera).update(detections)
+            for event in track_events:
+                log.info("track " + event["event"], camera=camera, track_id=event["track_id"],
+                         class_name=event["class_name"], dwell=event["dwell"])
+
+        if image is not None and self.zones.has_zones(camera):
+            with span("zones"):
+                detections = self.zones.annotate(detections, image.shape, camera)
+
+        now = datetime.now()
+        timestamp = now.isoformat()
+        with span("alert_analysis"):
+            # Every frame feeds the alert windows, empty ones included, so alerts can clear.
+            alert_data = self.alert_system.observe(detections, timestamp, camera, hour=now.hour + now.minute / 60.0)
+        # Sampled after scoring, so a frame is not compared against a baseline that already holds it.
+        self.sample_baseline(detections, camera)
+        for transition in alert_data['transitions']:
+            if transition['transition'] == CLEARED:
+                log.info("alert cleared", camera=camera, alert_type=transition['alert_type'],
+                         duration=transition['duration'])
+
+        if self.tracking and self.summary_trigger == "track_events":
+            changed = bool(track_events)
+        else:
+            # The gate sees empty frames too, so a scene that empties and refills counts as a change.
+            changed = self.scene_gate is None or self.scene_gate.should_summarize(detections, camera)
+            changed = changed or bool(track_events)
+        changed = changed or alert_data['should_alert']
+
+        if not detections or image is None:
+            log.debug("nothing to summarize", camera=camera)
+            if track_events:
+                # Departures usually arrive on an empty frame; they are recorded without a summary.
+                self.finish_summary("", detections, object_counts, timestamp, camera, track_events, alert_data)
+            return
+
+        if not changed:
+            log.debug("scene unchanged, reusing summary", camera=camera, summary=self.last_summary.get(camera))
+            DROPPED_FRAMES.labels("scene_unchanged").inc()
+            return
 
-    def detect_objects(self, image):
-        print("In vision object detecion")
-        print()
+        if not self.summary.ready() and not (self.summary_worker and self.summary.state == LOADING
+                                             and load_json_variable("summary_while_loading") == "queue"):
+            # Detection runs from the first frame; summaries wait for LLaVA, but raised alerts are still recorded.
+            DROPPED_FRAMES.labels("model_" + self.summary.state).inc()
+            self.record_unsummarized(detections, object_counts, timestamp, camera, track_events, alert_data)
+            return
 
+        if self.summary_worker:
+            # The capture loop draws on the frame afterwards, so the worker gets its own copy.
+            job = SummaryJob(image.copy(), detections, object_counts, timestamp, camera, track_events, alert_data)
+            self.summary_worker.submit(job)
+        else:
+            self.process_frame(image, detections, object_counts, timestamp, camera, track_events, alert_data)
+
+    def process_job(self, job: SummaryJob):
+        self.process_frame(job.frame, job.detections, job.object_counts, job.timestamp, job.camera, job.track_events,
+                           job.alert_data)
+
+    def process_jobs(self, jobs: List[SummaryJob]):
+        # One LLaVA call for every job the worker collected, across frames and cameras.
+        jobs = [job for job in jobs if job.detections and job.frame is not None]
+        if not jobs:
+            return
+        if not self.summary.wait():
+            for job in jobs:
+                self.record_unsummarized(job.detections, job.object_counts, job.timestamp, job.camera,
+                                         job.track_events, job.alert_data)
+            return
+        requests = [self.summary_request(job.frame, job.detections) for job in jobs]
+        summaries = self.summary.generate_summaries(requests)
+        for job, summary_text in zip(jobs, summaries):
+            self.finish_summary(summary_text, job.detections, job.object_counts, job.timestamp, job.camera,
+                                job.track_events, job.alert_data)
+
+    def record_unsummarized(self, detections: List[Dict], object_counts: Dict, timestamp: str = None,
+                            camera: str = None, track_events: List[Dict] = None, alert_data: Dict = None,
+                            reason: str = None):
+        # Without a summary the frame is lost, but a raised alert or a track event still has to reach the store.
+        if (alert_data or {}).get('should_alert') or track_events:
+            self.finish_summary(f"Summary unavailable ({reason or 'model ' + self.summary.state})", detections,
+                                object_counts, timestamp, camera, track_events, alert_data)
+
+    def record_dropped(self, job: SummaryJob):
+        self.record_unsummarized(job.detections, job.object_counts, job.timestamp, job.camera, job.track_events,
+                                 job.alert_data, reason="summary queue full")
+
+    def summary_request(self, image, detections: List[Dict]) -> Dict:
+        cache_key = None
+        if self.summary.cache is not None:
+            # Keyed on the frame itself, before any mosaic, so near-identical frames map to the same entry.
+            cache_key = summary_key(image, detections, grid=load_json_variable("summary_cache_grid"))
+
+        image_note = None
+        if self.summary_image_mode == "mosaic":
+            # Crops of the detections plus a thumbnail, so the LLM prefill covers far fewer image tokens.
+            max_crops = load_json_variable("mosaic_max_crops")
+            with span("mosaic"):
+                image = build_mosaic(image, detections, size=load_json_variable("mosaic_size"), max_crops=max_crops)
+            image_note = mosaic_note(detections, max_crops)
+
+        return {
+            'detections': str(detections),
+            'object_counts': len(detections),
+            'image': Image.fromarray(cv.cvtColor(image, cv.COLOR_BGR2RGB)),
+            'zones': describe_zones(zone_counts(detections)),
+            'image_note': image_note,
+            'cache_key': cache_key
+        }
+
+    def process_frame(self, image, detections: List[Dict], object_counts: Dict, timestamp: str = None, camera: str = None,
+                      track_events: List[Dict] = None, alert_data: Dict = None):
+        camera = camera or self.camera
+        if not detections or image is None:
+            log.debug("nothing to summarize", camera=camera)
+            return None
+        if not self.summary.wait():
+            log.debug("summary model unavailable", camera=camera, state=self.summary.state)
+            self.record_unsummarized(detections, object_counts, timestamp, camera, track_events, alert_data)
+            return None
+
+        request = self.summary_request(image, detections)
+        if load_json_variable("summary_streaming"):
+            summary_text = ""
+            for summary_text in self.summary.stream_summary(request):
+                LIVE_SUMMARIES.update(camera, summary_text)
+        else:
+            summary_text = self.summary.generate_summaries([request])[0]
+        return self.finish_summary(summary_text, detections, object_counts, timestamp, camera, track_events, alert_data)
+
+    def finish_summary(self, summary_text: str, detections: List[Dict], object_counts: Dict, timestamp: str = None,
+                       camera: str = None, track_events: List[Dict] = None, alert_data: Dict = None) -> str:
+        camera = camera or self.camera
+        if summary_text:
+            log.info("summary generated", camera=camera, summary=summary_text)
+            self.last_summary[camera] = summary_text
+            LIVE_SUMMARIES.update(camera, summary_text, done=True)
+
+        timestamp = timestamp or datetime.now().isoformat()
+        if alert_data is None:
+            with span("alert_analysis"):
+                alert_data = self.alert_system.analyze_detections(detections, timestamp, camera=camera)
+        if track_events:
+            alert_data['details']['track_events'] = track_events
+        occupied = zone_counts(detections)
+        if occupied:
+            alert_data['details']['zones'] = occupied
+
+        if alert_data.get('should_alert', False):
+            log.warning("alert triggered", camera=camera, alert=self.alert_system.format_alert_message(alert_data))
+
+        with span("event_write"):
+            self.record_event(summary_text, detections, object_counts, alert_data, camera, timestamp)
+        return summary_text
+
+    def detect_batch(self, frames: List[np.ndarray]) -> List[np.ndarray]:
+        if not frames:
+            return []
+
+        with span("yolo_inference"):
+            results = self.MODEL(frames, verbose=False)
+
+        with span("box_postprocess"):
+            boxes_data = [result.boxes.data for result in results]
+            sizes = [len(data) for data in boxes_data]
+
+            # One device-to-host copy for the whole batch instead of three per box.
+            host = torch.cat(boxes_data).cpu().numpy() if sum(sizes) else None
+
+            batch_records = []
+            offset = 0
+            for size in sizes:
+                data = host[offset:offset + size] if size else None
+                batch_records.append(records_from_array(data, self.confidence_threshold))
+                offset += size
+        return batch_records
+
+    def draw_detections(self, image, detections: List[Dict]):
+        for detection in detections:
+            x1, y1, x2, y2 = detection["bbox"]
+            cv.rectangle(image, (x1, y1), (x2, y2), (0, 255, 0), 2)
+            label = f"{detection['class_name']} {detection['confidence']:.2f}"
+            cv.putText(
+                image,
+                label,
+                (x1, y1 - 10),
+                cv.FONT_HERSHEY_SIMPLEX,
+                0.6,
+                (0, 255, 0),
+                2,
+            )
+
+    def tracker_for(self, camera: str) -> Tracker:
+        tracker = self.trackers.get(camera)
+        if tracker is None:
+            tracker = self.trackers[camera] = Tracker(iou_threshold=load_json_variable("track_iou_threshold"),
+                                                      min_hits=load_json_variable("track_min_hits"),
+                                                      lost_after=load_json_variable("track_lost_after"),
+                                                      loiter_seconds=load_json_variable("loiter_seconds"))
+        return tracker
+
+    def frame_has_motion(self, image, camera: str = None) -> bool:
+        if not self.motion_filter:
+            return True
+        camera = camera or self.camera
+        detector = self.motion_detectors.get(camera)
+        if detector is None:
+            detector = self.motion_detectors[camera] = MotionDetector(
+                method=load_json_variable("motion_method"),
+                width=load_json_variable("motion_width"),
+                pixel_threshold=load_json_variable("motion_threshold"),
+                min_area=load_json_variable("motion_min_area"),
+                rois=load_json_variable("motion_rois").get(camera),
+                refresh_interval=load_json_variable("motion_refresh"))
+        with span("motion_filter"):
+            moved = detector.has_motion(image)
+        if not moved:
+            DROPPED_FRAMES.labels("no_motion").inc()
+        return moved
+
+    def detect_objects(self, image, camera: str = None):
+        camera = camera or self.camera
+        detections = []
         try:
-            results = self.MODEL(image)
-            detections = []
-            object_counts = {}
-            for result in results:
-                if result.boxes is not None:
-                    boxes = result.boxes
-                    
-                    for box in boxes:
-                        x1, y1, x2, y2 = map(int, box.xyxy[0].cpu().numpy())
-                        confidence = float(box.conf[0].cpu().numpy())
-                        class_id = int(box.cls[0].cpu().numpy())
-                        class_name = self.MODEL.names[class_id]
-                        print(datetime.now().isoformat())
-                        if confidence >= self.confidence_threshold:
-                            detection = {
-                                "timestamp": datetime.now().isoformat(),
-                                "class_id": class_id,
-                                "class_name": class_name,
-                                "confidence": round(confidence, 3),
-                                "bbox": [x1, y1, x2, y2],
-                                "center": [(x1 + x2) // 2, (y1 + y2) // 2],
-                                "area": (x2 - x1) * (y2 - y1)
-                            }
-                            detections.append(detection)
-                            
-                            object_counts[class_name] = object_counts.get(class_name, 0) + 1
-
-                            print(object_counts)
-                            print(detections)
-                            if detections and image is not None:
-                                pil_image = Image.fromarray(cv.cvtColor(image, cv.COLOR_BGR2RGB))
-                                summary_text = self.summary.generate_summary(str(detections), len(detections), pil_image)
-                                print("Generated Summary:", summary_text)
-                                
-                                timestamp = datetime.now().isoformat()
-                                alert_data = self.alert_system.analyze_detections(detections, timestamp)
-                                
-                                if alert_data.get('should_alert', False):
-                                    print("ALERT TRIGGERED:")
-                                    print(self.alert_system.format_alert_message(alert_data))
-                                
-                                self.append_to_csv(summary_text, detections, object_counts, alert_data)
-                            else:
-                                print("No detections or image to summarize.")
-
-                            # self.summary.generate_summary(detections, object_counts, image)
-    
-                            cv.rectangle(image, (x1, y1), (x2, y2), (0, 255, 0), 2)
-                            label = f"{class_name} {confidence:.2f}"
-                            cv.putText(
-                                image,
-                                label,
-                                (x1, y1 - 10),
-                                cv.FONT_HERSHEY_SIMPLEX,
-                                0.6,
-                                (0, 255, 0),
-                                2,
-                            )
+            if not self.frame_has_motion(image, camera):
+                # Nothing moved: the previous result still describes the scene and YOLO is skipped.
+                detections = self.last_detections.get(camera, [])
+                self.sample_baseline(detections, camera)
+            else:
+                records = self.detect_batch([image])[0]
+                with span("detection_dicts"):
+                    detections = records_to_dicts(records, self.MODEL.names)
+                    object_counts = count_by_class(detections)
+                self.last_detections[camera] = detections
+
+                log.debug("objects detected", counts=object_counts, detections=detections)
+
+                # Summarize the whole frame once, before boxes are drawn onto it.
+                self.dispatch_frame(image, detections, object_counts, camera)
+
+            self.draw_detections(image, detections)
 
             if self.stream:
                 cv.imshow("VisionSense Live Stream", image)
         except Exception as e:
-            logging.error(f"Error in object detection: {e}")
-        return None
-
+            log.error("error in object detection", error=e)
+        return detections
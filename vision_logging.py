@@ -0,0 +1,146 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import threading
+import time
+from datetime import datetime
+from typing import Dict
+
+ROOT_LOGGER = "visionsense"
+
+_listener = None
+_setup_lock = threading.Lock()
+
+
+class StructuredLogger:
+    def __init__(self, logger: logging.Logger):
+        self.logger = logger
+
+    # Level check comes first so a disabled call never builds a record or formats fields.
+    def debug(self, msg: str, **fields):
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.log(logging.DEBUG, msg, extra={"fields": fields})
+
+    def info(self, msg: str, **fields):
+        if self.logger.isEnabledFor(logging.INFO):
+            self.logger.log(logging.INFO, msg, extra={"fields": fields})
+
+    def warning(self, msg: str, **fields):
+        if self.logger.isEnabledFor(logging.WARNING):
+            self.logger.log(logging.WARNING, msg, extra={"fields": fields})
+
+    def error(self, msg: str, **fields):
+        if self.logger.isEnabledFor(logging.ERROR):
+            self.logger.log(logging.ERROR, msg, extra={"fields": fields})
+
+    def isEnabledFor(self, level: int) -> bool:
+        return self.logger.isEnabledFor(level)
+
+
+def get_logger(name: str) -> StructuredLogger:
+    return StructuredLogger(logging.getLogger(f"{ROOT_LOGGER}.{name}"))
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__(fmt="%(asctime)s | %(levelname)s | %(name)s | %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            message += " | " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return message
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SnapshotQueueHandler(logging.handlers.QueueHandler):
+    # Fields are formatted later on the listener thread, so mutable values are frozen to text when enqueued.
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        fields = getattr(record, "fields", None)
+        if fields:
+            record.fields = {key: value if value is None or isinstance(value, (str, int, float, bool)) else str(value)
+                             for key, value in fields.items()}
+        return super().prepare(record)
+
+
+class RateLimitFilter(logging.Filter):
+    # Token bucket per (logger, event): `rate` records per second with bursts up to `burst`; warnings and errors pass.
+    def __init__(self, rate: float, burst: int = None):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self.suppressed = 0
+        self._buckets: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or self.rate <= 0:
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(self.burst), now]
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if tokens < 1.0:
+                bucket[0] = tokens
+                self.suppressed += 1
+                return False
+            bucket[0] = tokens - 1.0
+            return True
+
+
+class SamplingFilter(logging.Filter):
+    # Keeps a random fraction of records below WARNING; warnings and errors always pass.
+    def __init__(self, sample_rate: float):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+
+def setup_logging(level: str = "INFO", fmt: str = "text", rate_limit: float = 0, sample_rate: float = 1.0):
+    global _listener
+    with _setup_lock:
+        logger = logging.getLogger(ROOT_LOGGER)
+        logger.setLevel(getattr(logging, str(level).upper(), logging.INFO))
+        if _listener is not None:
+            return logger
+
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+
+        # Callers only enqueue the record; formatting and the blocking write happen on the listener thread.
+        log_queue = queue.SimpleQueue()
+        queue_handler = SnapshotQueueHandler(log_queue)
+        if sample_rate < 1.0:
+            queue_handler.addFilter(SamplingFilter(sample_rate))
+        if rate_limit:
+            queue_handler.addFilter(RateLimitFilter(rate_limit))
+
+        logger.addHandler(queue_handler)
+        logger.propagate = False
+        _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+        return logger
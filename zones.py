@@ -0,0 +1,97 @@
+import cv2 as cv
+import numpy as np
+from typing import Dict, List, Tuple
+from helper import load_json_variable
+from config import get_config, ConfigError
+
+
+class ZoneMap:
+    def __init__(self, zones: List[Dict], cell_size: int = 4):
+        for index, zone in enumerate(zones):
+            if not isinstance(zone, dict) or 'name' not in zone or len(zone.get('polygon', [])) < 3:
+                raise ConfigError(f"zone {index} needs a 'name' and a 'polygon' of at least 3 points")
+        self.names = [zone['name'] for zone in zones]
+        self.polygons = [np.asarray(zone['polygon'], dtype=np.float32) for zone in zones]
+        self.cell_size = max(1, int(cell_size))
+        self._shape = None
+        self._packed = None
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _rasterize(self, shape: Tuple[int, int]):
+        height, width = shape
+        rows = -(-height // self.cell_size)
+        cols = -(-width // self.cell_size)
+        # One bit per zone for every grid cell, packed 8 zones to a byte in np.packbits order.
+        packed = np.zeros((rows, cols, -(-len(self.names) // 8)), dtype=np.uint8)
+        mask = np.zeros((rows, cols), dtype=np.uint8)
+        for index, polygon in enumerate(self.polygons):
+            mask[:] = 0
+            cv.fillPoly(mask, [np.round(polygon / self.cell_size).astype(np.int32)], 1)
+            packed[:, :, index >> 3] |= mask << np.uint8(7 - (index & 7))
+        self._packed = packed
+        self._shape = shape
+
+    def membership(self, points: np.ndarray, shape: Tuple[int, ...]) -> np.ndarray:
+        # (points, zones) bool matrix for (x, y) pixel points in a frame of the given shape.
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        if not len(points) or not self.names:
+            return np.zeros((len(points), len(self.names)), dtype=bool)
+        if self._shape != tuple(shape[:2]):
+            self._rasterize(tuple(shape[:2]))
+
+        rows, cols = self._packed.shape[:2]
+        cells = np.floor_divide(points, self.cell_size).astype(np.intp)
+        x = np.clip(cells[:, 0], 0, cols - 1)
+        y = np.clip(cells[:, 1], 0, rows - 1)
+        return np.unpackbits(self._packed[y, x], axis=1, count=len(self.names)).astype(bool)
+
+    def annotate(self, detections: List[Dict], shape: Tuple[int, ...]) -> List[Dict]:
+        if not detections or not self.names:
+            return detections
+        centers = np.array([d['center'] for d in detections], dtype=np.float64)
+        inside = self.membership(centers, shape)
+        for detection, row in zip(detections, inside):
+            detection['zones'] = [self.names[index] for index in np.flatnonzero(row).tolist()]
+        return detections
+
+
+def zone_counts(detections: List[Dict]) -> Dict[str, Dict[str, int]]:
+    counts = {}
+    for detection in detections:
+        for zone in detection.get('zones', ()):
+            zone_classes = counts.setdefault(zone, {})
+            zone_classes[detection['class_name']] = zone_classes.get(detection['class_name'], 0) + 1
+    return counts
+
+
+def describe_zones(counts: Dict[str, Dict[str, int]]) -> str:
+    return "; ".join(f"{zone}: " + ", ".join(f"{count} {name}" for name, count in classes.items())
+                     for zone, classes in counts.items())
+
+
+class ZoneEngine:
+    def __init__(self, zones: Dict[str, List[Dict]] = None, cell_size: int = None):
+        self.cell_size = cell_size or load_json_variable('zone_cell_size')
+        self.maps: Dict[str, ZoneMap] = {}
+        self.load(zones if zones is not None else load_json_variable('zones'))
+        get_config().subscribe(self.apply_config, keys=['zones', 'zone_cell_size'])
+
+    def load(self, zones: Dict[str, List[Dict]]):
+        # Build every map before swapping, so a bad polygon keeps the previous zones.
+        self.maps = {camera: ZoneMap(camera_zones, self.cell_size) for camera, camera_zones in zones.items()}
+
+    def apply_config(self, changed: Dict):
+        self.cell_size = changed.get('zone_cell_size', self.cell_size)
+        self.load(changed['zones'] if 'zones' in changed else load_json_variable('zones'))
+
+    def has_zones(self, camera: str) -> bool:
+        zone_map = self.maps.get(camera)
+        return zone_map is not None and len(zone_map) > 0
+
+    def annotate(self, detections: List[Dict], shape: Tuple[int, ...], camera: str) -> List[Dict]:
+        zone_map = self.maps.get(camera)
+        if zone_map is None:
+            return detections
+        return zone_map.annotate(detections, shape)